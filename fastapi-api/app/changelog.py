@@ -0,0 +1,165 @@
+# Policy change log: every write bumps the policy revision, logs the changed
+# policy ids and NOTIFYs the Ryu controllers, all in the writer's transaction.
+# Shared by the sync (threadpool) and async (asyncpg) endpoints.
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from . import models, policy_list
+import asyncio
+import logging
+import psycopg2
+import select
+import threading
+
+log = logging.getLogger(__name__)
+
+# Bumps the revision, prunes the change log past POLICY_CHANGELOG_RETENTION
+# and queues the NOTIFY in one round trip, as the revision row stays locked
+# from here until the caller commits.
+RECORD_REVISION_SQL = text(
+    "WITH bumped AS ("
+    "  UPDATE policy_revision SET revision = revision + 1 WHERE id = 1 RETURNING revision"
+    "), pruned AS ("
+    "  DELETE FROM policy_changes WHERE revision <= (SELECT revision FROM bumped) - :retention"
+    ") "
+    "SELECT revision, pg_notify(:channel, revision::text) FROM bumped"
+)
+CURRENT_REVISION_SQL = text("SELECT revision FROM policy_revision WHERE id = 1")
+
+# psycopg2 DSN for the LISTEN connection (DATABASE_URL may name a driver)
+LISTEN_DSN = models.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def record_params() -> dict:
+    return {"channel": models.POLICY_NOTIFY_CHANNEL, "retention": models.POLICY_CHANGELOG_RETENTION}
+
+
+def change_rows(revision: int, op: str, policy_ids) -> list:
+    return [models.PolicyChangeDB(revision=revision, policy_id=policy_id, op=op)
+            for policy_id in policy_ids]
+
+
+def record_policy_change(db: Session, op: str, *policy_ids: str) -> int:
+    """
+    Bump the policy revision and log the change in the caller's transaction.
+    The revision row stays locked until commit, so writers commit in revision order.
+    The NOTIFY payload is just the new revision: controllers fetch the changes
+    since their last one, so a batch of any size is one small notification.
+    NOTIFY is transactional and only delivered if the caller commits.
+    """
+    revision = db.execute(RECORD_REVISION_SQL, record_params()).scalar()
+    db.add_all(change_rows(revision, op, policy_ids))
+    return revision
+
+
+async def record_policy_change_async(db, op: str, *policy_ids: str) -> int:
+    """record_policy_change() for an AsyncSession."""
+    revision = (await db.execute(RECORD_REVISION_SQL, record_params())).scalar()
+    db.add_all(change_rows(revision, op, policy_ids))
+    return revision
+
+
+def publish_revision():
+    policy_list.cache.clear()
+
+
+class RevisionFeed:
+    """
+    Latest policy revision for /changes long-polls. A thread LISTENs on
+    POLICY_NOTIFY_CHANNEL, so a write through any API process or replica
+    wakes every waiter at once; waiters await an asyncio.Condition and hold
+    neither a thread nor a connection.
+    """
+
+    def __init__(self):
+        self.revision = None  # None while not listening
+        self.loop = None
+        self.condition = None
+        self.stopping = threading.Event()
+
+        # Counters
+        self.waiters = 0  # Admitted /changes long-polls, waiting or re-reading
+
+    @property
+    def listening(self) -> bool:
+        return self.revision is not None
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.condition = asyncio.Condition()
+        self.stopping.clear()
+        threading.Thread(target=self._listen, name="policy-revision-listener", daemon=True).start()
+
+    def stop(self):
+        self.stopping.set()
+
+    async def wait(self, since: int, timeout: float):
+        """
+        Wait until the revision passes `since` or `timeout` elapses. Without
+        a LISTEN connection, return after POLICY_CHANGES_POLL_INTERVAL so the
+        caller re-reads the revision from the database.
+        """
+        if not self.listening:
+            await asyncio.sleep(min(timeout, models.POLICY_CHANGES_POLL_INTERVAL))
+            return
+        try:
+            async with self.condition:
+                await asyncio.wait_for(self.condition.wait_for(
+                    lambda: not self.listening or self.revision > since), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _set(self, revision):
+        async with self.condition:
+            self.revision = revision
+            self.condition.notify_all()
+
+    def _publish(self, revision):
+        try:
+            asyncio.run_coroutine_threadsafe(self._set(revision), self.loop)
+        except RuntimeError:
+            pass  # Event loop closed at shutdown
+
+    def _listen(self):
+        backoff = 1
+        while not self.stopping.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(LISTEN_DSN)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {models.POLICY_NOTIFY_CHANNEL};")
+                    # After LISTEN, so no write between the two is missed
+                    cur.execute(CURRENT_REVISION_SQL.text)
+                    row = cur.fetchone()
+                self._publish(row[0] if row else 0)
+                log.info(f"Listening for policy revisions on '{models.POLICY_NOTIFY_CHANNEL}'.")
+                backoff = 1
+
+                while not self.stopping.is_set():
+                    # The timeout only bounds how long stop() takes
+                    select.select([conn], [], [], models.POLICY_CHANGES_POLL_INTERVAL)
+                    conn.poll()
+                    if conn.notifies:
+                        # Writers commit in revision order: the last one is the newest
+                        self._publish(int(conn.notifies[-1].payload))
+                        conn.notifies.clear()
+            except Exception as e:
+                log.error(f"Policy revision listener error: {e}. Reconnecting in {backoff}s...")
+                self._publish(None)  # Waiters fall back to polling
+                self.stopping.wait(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+revisions = RevisionFeed()
+
+
+def current_revision(db: Session) -> int:
+    return db.execute(CURRENT_REVISION_SQL).scalar() or 0
+
+
+async def current_revision_async(db) -> int:
+    return (await db.execute(CURRENT_REVISION_SQL)).scalar() or 0
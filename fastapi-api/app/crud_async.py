@@ -0,0 +1,105 @@
+# Async versions of the policy CRUD endpoints (API_ASYNC_DB=1). They run on
+# the event loop with an asyncpg-backed AsyncSession, so concurrent requests
+# are bounded by the connection pool instead of the threadpool.
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, policy_list
+from .changelog import record_policy_change_async, current_revision_async, publish_revision
+import uuid
+from typing import List, Literal, Optional
+
+router = APIRouter()
+
+
+async def get_async_db():
+    async with models.AsyncSessionLocal() as db:
+        yield db
+
+
+@router.post("/api/v1/policies", response_model=models.PolicyResponse, status_code=201)
+async def create_policy(policy: models.PolicySchema, db: AsyncSession = Depends(get_async_db)):
+    """
+    Create a new declarative security policy.
+    This intent is written to the PostgreSQL database[cite: 62].
+    """
+    policy_id = str(uuid.uuid4())
+    revision = await record_policy_change_async(db, "CREATE", policy_id)
+    db_policy = models.PolicyDB(id=policy_id, revision=revision, **policy.columns())
+    db.add(db_policy)
+    await db.commit()
+    publish_revision()
+    return db_policy
+
+
+@router.get("/api/v1/policies", response_model=List[models.PolicyResponse])
+async def get_all_policies(
+    request: Request,
+    status: Optional[Literal["ENABLED", "DISABLED"]] = None,
+    action: Optional[Literal["ALLOW", "DENY"]] = None,
+    name_prefix: Optional[str] = Query(None, min_length=1),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=models.POLICY_LIST_MAX_LIMIT,
+                                 description="Page size; all matching policies if omitted"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Retrieve policies ordered by (priority, id), optionally filtered and paged.
+    Send the ETag back as If-None-Match to get 304 while nothing changed.
+    """
+    query = policy_list.PolicyListQuery(status, action, name_prefix, cursor, limit)
+    revision = await current_revision_async(db)
+    response = policy_list.cached_response(request, query, revision)
+    if response is None:
+        result = await db.execute(query.statement())
+        response = policy_list.render(request, query, revision, result.scalars().all())
+    return response
+
+
+@router.get("/api/v1/policies/{policy_id}", response_model=models.PolicyResponse)
+async def get_policy(policy_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Retrieve a specific policy by ID.
+    """
+    policy = await db.get(models.PolicyDB, policy_id)
+    if not policy:
+        raise HTTPException(status_code=404, detail="Policy not found")
+    return policy
+
+
+@router.put("/api/v1/policies/{policy_id}", response_model=models.PolicyResponse)
+async def update_policy(policy_id: str, policy: models.PolicySchema, db: AsyncSession = Depends(get_async_db)):
+    """
+    Update an existing policy.
+    The Ryu controller is notified via PostgreSQL LISTEN/NOTIFY.
+    """
+    db_policy = await db.get(models.PolicyDB, policy_id)
+    if not db_policy:
+        raise HTTPException(status_code=404, detail="Policy not found")
+
+    for column, value in policy.columns().items():
+        setattr(db_policy, column, value)
+    db_policy.revision = await record_policy_change_async(db, "UPDATE", policy_id)
+
+    await db.commit()
+    publish_revision()
+    return db_policy
+
+
+@router.delete("/api/v1/policies/{policy_id}", status_code=204)
+async def delete_policy(policy_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Delete a policy by ID.
+    The Ryu controller is notified and removes the associated flows.
+    """
+    db_policy = await db.get(models.PolicyDB, policy_id)
+    if not db_policy:
+        raise HTTPException(status_code=404, detail="Policy not found")
+
+    await db.execute(delete(models.PolicyStatsDB).where(models.PolicyStatsDB.policy_id == policy_id))
+    await db.delete(db_policy)
+    await record_policy_change_async(db, "DELETE", policy_id)
+    await db.commit()
+    publish_revision()
+    return None
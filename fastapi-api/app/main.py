@@ -1,11 +1,16 @@
 # This implements the IBN API endpoints. The POST endpoint writes the
 # [cite_start]declarative intent to the PostgreSQL database[cite: 163, 167].
 
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from . import models
+from . import models, policy_list
+from .changelog import record_policy_change, publish_revision, current_revision, revisions
+from starlette.concurrency import run_in_threadpool
+import anyio.to_thread
+import time
 import uuid
-from typing import List
+from typing import List, Literal, Optional
 
 app = FastAPI(
     title="SDN Zero-Trust IBN API",
@@ -22,40 +27,264 @@ def get_db():
         db.close()
 
 
-@app.post("/api/v1/policies", response_model=models.PolicyResponse, status_code=201)
+@app.on_event("startup")
+async def configure_threadpool():
+    # Sync endpoints run on anyio's default threadpool (see models.API_THREADPOOL_SIZE)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = models.API_THREADPOOL_SIZE
+
+
+@app.on_event("startup")
+async def start_revision_feed():
+    revisions.start()
+
+
+@app.on_event("shutdown")
+async def stop_revision_feed():
+    revisions.stop()
+
+
+# Policy CRUD endpoints (threadpool). Swapped for crud_async.router with
+# API_ASYNC_DB=1; see the end of this module.
+crud = APIRouter()
+
+
+@crud.post("/api/v1/policies", response_model=models.PolicyResponse, status_code=201)
 def create_policy(policy: models.PolicySchema, db: Session = Depends(get_db)):
     """
     Create a new declarative security policy.
     This intent is written to the PostgreSQL database[cite: 62].
     """
     policy_id = str(uuid.uuid4())
-    db_policy = models.PolicyDB(
-        id=policy_id,
-        name=policy.name,
-        priority=policy.priority,
-        source=policy.source.dict(),
-        destination=policy.destination.dict(),
-        service=[s.dict() for s in policy.service] if policy.service else None,
-        action=policy.action,
-        status=policy.status
-    )
+    revision = record_policy_change(db, "CREATE", policy_id)
+    db_policy = models.PolicyDB(id=policy_id, revision=revision, **policy.columns())
     db.add(db_policy)
     db.commit()
+    publish_revision()
     db.refresh(db_policy)
     return db_policy
 
 
-@app.get("/api/v1/policies", response_model=List[models.PolicyResponse])
-def get_all_policies(db: Session = Depends(get_db)):
+def check_batch_size(count: int):
+    if count > models.POLICY_BATCH_MAX:
+        raise HTTPException(status_code=413,
+                            detail=f"Batch of {count} items exceeds POLICY_BATCH_MAX ({models.POLICY_BATCH_MAX})")
+
+
+def finish_batch(db: Session, op: str, results: list, rows: list, atomic: bool, write) -> models.PolicyBatchResponse:
+    """
+    Write the valid rows with write(revision) and commit once, with one
+    revision and one change notification for the whole batch. With atomic,
+    any failed item leaves the database untouched.
+    """
+    failed = any(r.status >= 400 for r in results)
+    if not rows or (atomic and failed):
+        db.rollback()
+        return models.PolicyBatchResponse(revision=current_revision(db), results=results)
+    revision = record_policy_change(db, op, *(row["id"] for row in rows))
+    write(revision)
+    db.commit()
+    publish_revision()
+    return models.PolicyBatchResponse(revision=revision, results=results)
+
+
+@app.post("/api/v1/policies:batch", response_model=models.PolicyBatchResponse)
+def create_policies(batch: models.PolicyBatch, db: Session = Depends(get_db)):
+    """
+    Create many policies in one transaction with a single bulk insert.
+    Each item is validated as a PolicySchema and gets its own result.
+    """
+    check_batch_size(len(batch.items))
+    results, rows = [], []
+    for index, item in enumerate(batch.items):
+        try:
+            policy = models.PolicySchema.parse_obj(item)
+        except ValidationError as e:
+            results.append(models.PolicyBatchResult(index=index, status=422, error=e.errors()))
+            continue
+        row = dict(policy.columns(), id=str(uuid.uuid4()))
+        rows.append(row)
+        results.append(models.PolicyBatchResult(index=index, id=row["id"], status=201))
+
+    def write(revision):
+        for row in rows:
+            row["revision"] = revision
+        db.bulk_insert_mappings(models.PolicyDB, rows)
+        policies = iter(rows)
+        for result in results:
+            if result.status == 201:
+                result.policy = models.PolicyResponse(**next(policies))
+
+    return finish_batch(db, "CREATE", results, rows, batch.atomic, write)
+
+
+@app.put("/api/v1/policies:batch", response_model=models.PolicyBatchResponse)
+def update_policies(batch: models.PolicyBatch, db: Session = Depends(get_db)):
+    """
+    Update many policies (items carry their `id`) in one transaction
+    with a single bulk update.
+    """
+    check_batch_size(len(batch.items))
+    parsed = []
+    for item in batch.items:
+        try:
+            parsed.append(models.PolicyBatchUpdateItem.parse_obj(item))
+        except ValidationError as e:
+            parsed.append(e)
+    ids = {p.id for p in parsed if not isinstance(p, ValidationError)}
+    existing = {policy_id for (policy_id,) in
+                db.query(models.PolicyDB.id).filter(models.PolicyDB.id.in_(list(ids)))} if ids else set()
+
+    results, rows, seen = [], [], set()
+    for index, policy in enumerate(parsed):
+        if isinstance(policy, ValidationError):
+            results.append(models.PolicyBatchResult(index=index, status=422, error=policy.errors()))
+        elif policy.id not in existing:
+            results.append(models.PolicyBatchResult(index=index, id=policy.id, status=404,
+                                                    error="Policy not found"))
+        elif policy.id in seen:
+            results.append(models.PolicyBatchResult(index=index, id=policy.id, status=409,
+                                                    error="Duplicate id in batch"))
+        else:
+            seen.add(policy.id)
+            rows.append(dict(policy.columns(), id=policy.id))
+            results.append(models.PolicyBatchResult(index=index, id=policy.id, status=200))
+
+    def write(revision):
+        for row in rows:
+            row["revision"] = revision
+        db.bulk_update_mappings(models.PolicyDB, rows)
+        policies = iter(rows)
+        for result in results:
+            if result.status == 200:
+                result.policy = models.PolicyResponse(**next(policies))
+
+    return finish_batch(db, "UPDATE", results, rows, batch.atomic, write)
+
+
+@app.delete("/api/v1/policies:batch", response_model=models.PolicyBatchResponse)
+def delete_policies(batch: models.PolicyBatchDelete, db: Session = Depends(get_db)):
+    """
+    Delete many policies by id in one transaction.
     """
-    Retrieve all active policies from the database.
+    check_batch_size(len(batch.ids))
+    existing = {policy_id for (policy_id,) in
+                db.query(models.PolicyDB.id).filter(models.PolicyDB.id.in_(batch.ids))} if batch.ids else set()
+
+    results, rows, seen = [], [], set()
+    for index, policy_id in enumerate(batch.ids):
+        if policy_id not in existing:
+            results.append(models.PolicyBatchResult(index=index, id=policy_id, status=404,
+                                                    error="Policy not found"))
+        elif policy_id in seen:
+            results.append(models.PolicyBatchResult(index=index, id=policy_id, status=409,
+                                                    error="Duplicate id in batch"))
+        else:
+            seen.add(policy_id)
+            rows.append({"id": policy_id})
+            results.append(models.PolicyBatchResult(index=index, id=policy_id, status=204))
+
+    def write(revision):
+        ids = [row["id"] for row in rows]
+        db.query(models.PolicyStatsDB).filter(models.PolicyStatsDB.policy_id.in_(ids)).delete(synchronize_session=False)
+        db.query(models.PolicyDB).filter(models.PolicyDB.id.in_(ids)).delete(synchronize_session=False)
+
+    return finish_batch(db, "DELETE", results, rows, batch.atomic, write)
+
+
+@crud.get("/api/v1/policies", response_model=List[models.PolicyResponse])
+def get_all_policies(
+    request: Request,
+    status: Optional[Literal["ENABLED", "DISABLED"]] = None,
+    action: Optional[Literal["ALLOW", "DENY"]] = None,
+    name_prefix: Optional[str] = Query(None, min_length=1),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=models.POLICY_LIST_MAX_LIMIT,
+                                 description="Page size; all matching policies if omitted"),
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve policies ordered by (priority, id), optionally filtered and paged.
     The Master Ryu controller will use a similar function[cite: 64].
+    Send the ETag back as If-None-Match to get 304 while nothing changed.
+    """
+    query = policy_list.PolicyListQuery(status, action, name_prefix, cursor, limit)
+    revision = current_revision(db)
+    response = policy_list.cached_response(request, query, revision)
+    if response is None:
+        response = policy_list.render(request, query, revision, db.execute(query.statement()).scalars().all())
+    return response
+
+
+@app.get("/api/v1/policies/changes", response_model=models.PolicyChangesResponse)
+async def get_policy_changes(
+    since: int = Query(0, ge=0, description="Last revision the client has applied"),
+    wait: float = Query(0, ge=0, le=models.POLICY_CHANGES_MAX_WAIT,
+                        description="Seconds to wait for a change if there is none yet"),
+    limit: int = Query(1000, ge=1, le=10000),
+):
     """
-    policies = db.query(models.PolicyDB).all()
-    return policies
+    Return the policies changed after revision `since`, with their current state.
+    Clients keep the returned `revision` and pass it as `since` next time;
+    410 means the change log no longer reaches back that far and the client
+    must reload the full list.
+    Long-polls wait on the event loop, so they hold no thread or connection.
+    """
+    deadline = time.monotonic() + wait
+    response = await run_in_threadpool(read_policy_changes, since, limit)
+    if response.revision != since or wait == 0:
+        return response
+
+    # Admitted once: the slot is held until the long-poll returns
+    if revisions.waiters >= models.POLICY_CHANGES_MAX_WAITERS:
+        raise HTTPException(status_code=503, detail="Too many waiting /changes requests",
+                            headers={"Retry-After": "1"})
+    revisions.waiters += 1
+    try:
+        while response.revision == since and time.monotonic() < deadline:
+            await revisions.wait(since, deadline - time.monotonic())
+            response = await run_in_threadpool(read_policy_changes, since, limit)
+    finally:
+        revisions.waiters -= 1
+    return response
+
+
+def read_policy_changes(since: int, limit: int) -> models.PolicyChangesResponse:
+    db = models.SessionLocal()
+    try:
+        revision = current_revision(db)
+        if since > revision:
+            raise HTTPException(status_code=410, detail=f"Revision {since} is ahead of the server ({revision})")
+        if since == revision:
+            return models.PolicyChangesResponse(revision=revision, changes=[])
+        oldest = db.query(models.PolicyChangeDB.revision).order_by(models.PolicyChangeDB.revision).first()
+        if oldest is None or since < oldest[0] - 1:
+            raise HTTPException(status_code=410, detail=f"Change log no longer reaches revision {since}")
+
+        rows = (db.query(models.PolicyChangeDB)
+                .filter(models.PolicyChangeDB.revision > since, models.PolicyChangeDB.revision <= revision)
+                .order_by(models.PolicyChangeDB.revision, models.PolicyChangeDB.policy_id)
+                .limit(limit + 1).all())
+        if len(rows) > limit:
+            # Only return whole revisions, so `revision` is a safe resume point
+            last = rows[limit].revision
+            rows = [row for row in rows if row.revision < last]
+            if not rows:
+                rows = db.query(models.PolicyChangeDB).filter(models.PolicyChangeDB.revision == last).all()
+            revision = rows[-1].revision
+
+        # Newest entry per policy; the state returned is the current one
+        latest = {row.policy_id: row for row in rows}
+        policies = {p.id: p for p in
+                    db.query(models.PolicyDB).filter(models.PolicyDB.id.in_(list(latest))).all()}
+        changes = [models.PolicyChange(revision=row.revision, policy_id=row.policy_id, op=row.op,
+                                       policy=policies.get(row.policy_id))
+                   for row in sorted(latest.values(), key=lambda r: (r.revision, r.policy_id))]
+        return models.PolicyChangesResponse(revision=revision, changes=changes)
+    finally:
+        db.close()
 
 
-@app.get("/api/v1/policies/{policy_id}", response_model=models.PolicyResponse)
+@crud.get("/api/v1/policies/{policy_id}", response_model=models.PolicyResponse)
 def get_policy(policy_id: str, db: Session = Depends(get_db)):
     """
     Retrieve a specific policy by ID.
@@ -66,42 +295,64 @@ def get_policy(policy_id: str, db: Session = Depends(get_db)):
     return policy
 
 
-@app.put("/api/v1/policies/{policy_id}", response_model=models.PolicyResponse)
+@app.get("/api/v1/policies/{policy_id}/stats", response_model=models.PolicyStatsResponse)
+def get_policy_stats(policy_id: str, db: Session = Depends(get_db)):
+    """
+    Retrieve a policy's hit counters (packets and bytes its flows matched).
+    The Ryu controllers poll flow stats and accumulate them here.
+    """
+    policy = db.query(models.PolicyDB).filter(models.PolicyDB.id == policy_id).first()
+    if not policy:
+        raise HTTPException(status_code=404, detail="Policy not found")
+    stats = db.query(models.PolicyStatsDB).filter(models.PolicyStatsDB.policy_id == policy_id).first()
+    if not stats:
+        return models.PolicyStatsResponse(policy_id=policy_id)
+    return stats
+
+
+@crud.put("/api/v1/policies/{policy_id}", response_model=models.PolicyResponse)
 def update_policy(policy_id: str, policy: models.PolicySchema, db: Session = Depends(get_db)):
     """
     Update an existing policy.
-    The Ryu controller will detect this change via its polling mechanism.
+    The Ryu controller is notified via PostgreSQL LISTEN/NOTIFY.
     """
     db_policy = db.query(models.PolicyDB).filter(models.PolicyDB.id == policy_id).first()
     if not db_policy:
         raise HTTPException(status_code=404, detail="Policy not found")
     
     # Update fields
-    db_policy.name = policy.name
-    db_policy.priority = policy.priority
-    db_policy.source = policy.source.dict()
-    db_policy.destination = policy.destination.dict()
-    db_policy.service = [s.dict() for s in policy.service] if policy.service else None
-    db_policy.action = policy.action
-    db_policy.status = policy.status
+    for column, value in policy.columns().items():
+        setattr(db_policy, column, value)
+    db_policy.revision = record_policy_change(db, "UPDATE", policy_id)
     
     db.commit()
+    publish_revision()
     db.refresh(db_policy)
     return db_policy
 
 
-@app.delete("/api/v1/policies/{policy_id}", status_code=204)
+@crud.delete("/api/v1/policies/{policy_id}", status_code=204)
 def delete_policy(policy_id: str, db: Session = Depends(get_db)):
     """
     Delete a policy by ID.
-    The Ryu controller will detect this change and remove associated flows.
+    The Ryu controller is notified and removes the associated flows.
     """
     db_policy = db.query(models.PolicyDB).filter(models.PolicyDB.id == policy_id).first()
     if not db_policy:
         raise HTTPException(status_code=404, detail="Policy not found")
     
+    db.query(models.PolicyStatsDB).filter(models.PolicyStatsDB.policy_id == policy_id).delete()
     db.delete(db_policy)
+    record_policy_change(db, "DELETE", policy_id)
     db.commit()
+    publish_revision()
     return None
 
 
+# Included last so /changes, :batch and /stats above take precedence
+# over /{policy_id}
+if models.API_ASYNC_DB:
+    from .crud_async import router as crud_router
+else:
+    crud_router = crud
+app.include_router(crud_router)
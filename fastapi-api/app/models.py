@@ -1,12 +1,14 @@
 # [cite_start]This file defines the Pydantic/SQLAlchemy models based on Table 2 [cite: 191-194]
 # and the database connection.
 
-from sqlalchemy import create_engine, Column, String, Integer, JSON
+from sqlalchemy import create_engine, text, Column, Index, String, Integer, BigInteger, JSON, DateTime
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import OperationalError
 from pydantic import BaseModel, Field
-from typing import Optional, List, Literal
+from typing import Any, Optional, List, Literal
+from datetime import datetime
 import os
 import time
 import logging
@@ -17,13 +19,66 @@ DATABASE_URL = os.environ.get("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable must be set")
 
-# Create engine with connection pooling and retry logic
-engine = create_engine(
-    DATABASE_URL,
+# Channel the Ryu controllers LISTEN on for policy change notifications
+POLICY_NOTIFY_CHANNEL = os.environ.get("POLICY_NOTIFY_CHANNEL", "policy_changes")
+
+# Policy change log: revisions older than the newest POLICY_CHANGELOG_RETENTION
+# are pruned (clients that fall further behind get 410 and reload). Long-polls
+# on /changes wait at most POLICY_CHANGES_MAX_WAIT seconds on the event loop
+# and are woken by LISTEN on POLICY_NOTIFY_CHANNEL; while that connection is
+# down they re-check the revision every POLICY_CHANGES_POLL_INTERVAL. At most
+# POLICY_CHANGES_MAX_WAITERS long-polls wait per process; more get 503.
+POLICY_CHANGELOG_RETENTION = int(os.environ.get("POLICY_CHANGELOG_RETENTION", "10000"))
+POLICY_CHANGES_MAX_WAIT = float(os.environ.get("POLICY_CHANGES_MAX_WAIT", "60"))
+POLICY_CHANGES_POLL_INTERVAL = float(os.environ.get("POLICY_CHANGES_POLL_INTERVAL", "0.5"))
+POLICY_CHANGES_MAX_WAITERS = int(os.environ.get("POLICY_CHANGES_MAX_WAITERS", "1000"))
+
+# Maximum items per /api/v1/policies:batch request
+POLICY_BATCH_MAX = int(os.environ.get("POLICY_BATCH_MAX", "1000"))
+
+# GET /api/v1/policies: largest page size a client may ask for, and how many
+# rendered pages (distinct filter/cursor/limit combinations) are cached
+POLICY_LIST_MAX_LIMIT = int(os.environ.get("POLICY_LIST_MAX_LIMIT", "1000"))
+POLICY_LIST_CACHE_SIZE = int(os.environ.get("POLICY_LIST_CACHE_SIZE", "256"))
+
+# Connection pool per API process (and per engine). Sync endpoints and their
+# get_db() cleanup share one threadpool; with more threads than connections
+# every thread can end up waiting for a connection while the requests holding
+# them wait for a thread to close their session, until DB_POOL_TIMEOUT. So the
+# threadpool defaults to DB_POOL_SIZE + DB_MAX_OVERFLOW threads. /changes
+# long-polls wait on the event loop and only borrow a thread for each read.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "3600"))
+API_THREADPOOL_SIZE = int(os.environ.get("API_THREADPOOL_SIZE", DB_POOL_SIZE + DB_MAX_OVERFLOW))
+
+# API_ASYNC_DB=1 serves the policy CRUD endpoints as async handlers on an
+# asyncpg engine (ASYNC_DATABASE_URL, by default DATABASE_URL with the
+# postgresql+asyncpg driver) instead of on the threadpool.
+API_ASYNC_DB = os.environ.get("API_ASYNC_DB", "0") == "1"
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL") or \
+    make_url(DATABASE_URL).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+POOL_SETTINGS = dict(
     pool_pre_ping=True,  # Verify connections before using them
-    pool_recycle=3600,   # Recycle connections after 1 hour
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
 )
+
+# Create engine with connection pooling and retry logic
+engine = create_engine(DATABASE_URL, **POOL_SETTINGS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = None
+AsyncSessionLocal = None
+if API_ASYNC_DB:
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **POOL_SETTINGS)
+    AsyncSessionLocal = sessionmaker(bind=async_engine, class_=AsyncSession,
+                                     autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
@@ -38,6 +93,47 @@ class PolicyDB(Base):
     service = Column(JSON, nullable=True)
     action = Column(String, nullable=False)
     status = Column(String, nullable=False, default="ENABLED")
+    revision = Column(BigInteger, nullable=False, default=0, index=True)  # Revision of the last write
+
+    __table_args__ = (
+        Index("ix_policies_priority_id", "priority", "id"),  # List order and cursor
+    )
+
+
+# Single-row revision counter. Every write bumps it in its own transaction;
+# the row lock serializes writers, so revisions become visible in order.
+class PolicyRevisionDB(Base):
+    __tablename__ = "policy_revision"
+    id = Column(Integer, primary_key=True)
+    revision = Column(BigInteger, nullable=False, default=0)
+
+
+# One row per policy changed at a revision
+class PolicyChangeDB(Base):
+    __tablename__ = "policy_changes"
+    revision = Column(BigInteger, primary_key=True)
+    policy_id = Column(String, primary_key=True)
+    op = Column(String, nullable=False)  # CREATE, UPDATE or DELETE
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+# Per-policy hit counters, accumulated by the Ryu controllers from flow stats
+class PolicyStatsDB(Base):
+    __tablename__ = "policy_stats"
+    policy_id = Column(String, primary_key=True)
+    packet_count = Column(BigInteger, nullable=False, default=0)
+    byte_count = Column(BigInteger, nullable=False, default=0)
+    last_hit_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+
+
+# Schema changes create_all() does not apply to existing tables
+MIGRATIONS = [
+    "ALTER TABLE policies ADD COLUMN IF NOT EXISTS revision BIGINT NOT NULL DEFAULT 0",
+    "CREATE INDEX IF NOT EXISTS ix_policies_revision ON policies (revision)",
+    "CREATE INDEX IF NOT EXISTS ix_policies_priority_id ON policies (priority, id)",
+    "INSERT INTO policy_revision (id, revision) VALUES (1, 0) ON CONFLICT (id) DO NOTHING",
+]
 
 
 # Create the table with retry logic for initial connection
@@ -45,6 +141,9 @@ max_retries = 5
 for attempt in range(max_retries):
     try:
         Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            for statement in MIGRATIONS:
+                conn.execute(text(statement))
         log.info("Successfully connected to database and created tables.")
         break
     except OperationalError as e:
@@ -86,11 +185,78 @@ class PolicySchema(BaseModel):
     action: Literal["ALLOW", "DENY"]
     status: Literal["ENABLED", "DISABLED"]
 
+    def columns(self) -> dict:
+        """PolicyDB column values (without id and revision)."""
+        return {
+            "name": self.name,
+            "priority": self.priority,
+            "source": self.source.dict(),
+            "destination": self.destination.dict(),
+            "service": [s.dict() for s in self.service] if self.service else None,
+            "action": self.action,
+            "status": self.status,
+        }
+
 
 class PolicyResponse(PolicySchema):
     id: str
+    revision: int = 0
 
     class Config:
         orm_mode = True
 
 
+class PolicyStatsResponse(BaseModel):
+    policy_id: str
+    packet_count: int = 0
+    byte_count: int = 0
+    last_hit_at: Optional[datetime]  # None: never matched traffic
+    updated_at: Optional[datetime]   # None: no stats reported yet
+
+    class Config:
+        orm_mode = True
+
+
+class PolicyChange(BaseModel):
+    revision: int
+    policy_id: str
+    op: Literal["CREATE", "UPDATE", "DELETE"]
+    policy: Optional[PolicyResponse]  # Current state; None if it no longer exists
+
+
+class PolicyChangesResponse(BaseModel):
+    revision: int  # Pass as `since` on the next call
+    changes: List[PolicyChange]
+
+
+# --- Batch requests ---
+# Items are validated one by one (PolicySchema), so one bad item is reported
+# in its result instead of rejecting the whole request. With atomic=true any
+# failed item rolls the whole batch back.
+
+
+class PolicyBatch(BaseModel):
+    items: List[dict]  # PolicySchema for create, PolicyBatchUpdateItem for update
+    atomic: bool = False
+
+
+class PolicyBatchUpdateItem(PolicySchema):
+    id: str
+
+
+class PolicyBatchDelete(BaseModel):
+    ids: List[str]
+    atomic: bool = False
+
+
+class PolicyBatchResult(BaseModel):
+    index: int
+    id: Optional[str]
+    status: int  # HTTP status of this item: 201, 200, 204, 404, 409 or 422
+    error: Optional[Any]
+    policy: Optional[PolicyResponse]
+
+
+class PolicyBatchResponse(BaseModel):
+    revision: int  # Revision of the batch; unchanged if nothing was written
+    results: List[PolicyBatchResult]
@@ -0,0 +1,142 @@
+# GET /api/v1/policies: filters, cursor pagination, ETags and a response cache,
+# shared by the sync and async CRUD endpoints.
+#
+# Pages are ordered by (priority, id); the cursor is the last (priority, id)
+# of the previous page. The ETag is the policy revision plus the query, so it
+# is checked with a single-row read of policy_revision and a 304 never scans
+# the policies table. Rendered bodies are cached per query for the revision
+# they were read at; writes in this process clear the cache and writes by
+# other replicas change the revision, which misses it.
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import select, tuple_
+from . import models
+from collections import OrderedDict
+from typing import Optional
+import base64
+import hashlib
+import json
+import threading
+
+
+class PolicyListQuery:
+    def __init__(self, status: Optional[str], action: Optional[str], name_prefix: Optional[str],
+                 cursor: Optional[str], limit: Optional[int]):
+        self.status = status
+        self.action = action
+        self.name_prefix = name_prefix
+        self.after = decode_cursor(cursor) if cursor else None
+        self.limit = limit
+        self.key = (status, action, name_prefix, self.after, limit)
+
+    def etag(self, revision: int) -> str:
+        digest = hashlib.sha1(repr(self.key).encode()).hexdigest()[:16]
+        return f'"{revision}-{digest}"'
+
+    def statement(self):
+        stmt = select(models.PolicyDB)
+        if self.status:
+            stmt = stmt.where(models.PolicyDB.status == self.status)
+        if self.action:
+            stmt = stmt.where(models.PolicyDB.action == self.action)
+        if self.name_prefix:
+            stmt = stmt.where(models.PolicyDB.name.startswith(self.name_prefix, autoescape=True))
+        if self.after:
+            stmt = stmt.where(tuple_(models.PolicyDB.priority, models.PolicyDB.id) > tuple(self.after))
+        stmt = stmt.order_by(models.PolicyDB.priority, models.PolicyDB.id)
+        if self.limit:
+            stmt = stmt.limit(self.limit + 1)  # One more tells whether there is a next page
+        return stmt
+
+
+def encode_cursor(priority: int, policy_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([priority, policy_id]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        priority, policy_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(priority, int) or not isinstance(policy_id, str):
+            raise ValueError(cursor)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return priority, policy_id
+
+
+class ResponseCache:
+    """LRU of rendered list pages: { query key: (revision, body, next cursor) }."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, revision: int):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != revision:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        if self.size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+cache = ResponseCache(models.POLICY_LIST_CACHE_SIZE)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+
+def respond(request: Request, query: PolicyListQuery, revision: int, body: bytes, next_cursor: Optional[str]) -> Response:
+    headers = {"ETag": query.etag(revision), "Cache-Control": "no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cached_response(request: Request, query: PolicyListQuery, revision: int) -> Optional[Response]:
+    """
+    304 if the client's copy is current, else the cached page for this
+    revision, else None: the caller queries query.statement() and passes the
+    rows to render(). The revision must be read before the rows, so a page is
+    never tagged with a newer revision than its content.
+    """
+    if etag_matches(request, query.etag(revision)):
+        return Response(status_code=304, headers={"ETag": query.etag(revision), "Cache-Control": "no-cache"})
+    entry = cache.get(query.key, revision)
+    if entry is None:
+        return None
+    return respond(request, query, revision, entry[1], entry[2])
+
+
+def render(request: Request, query: PolicyListQuery, revision: int, rows: list) -> Response:
+    next_cursor = None
+    if query.limit and len(rows) > query.limit:
+        rows = rows[:query.limit]
+        next_cursor = encode_cursor(rows[-1].priority, rows[-1].id)
+    body = json.dumps([models.PolicyResponse.from_orm(row).dict() for row in rows]).encode()
+    cache.put(query.key, (revision, body, next_cursor))
+    return respond(request, query, revision, body, next_cursor)
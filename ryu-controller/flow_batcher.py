@@ -0,0 +1,145 @@
+import itertools
+import logging
+import time
+
+
+log = logging.getLogger(__name__)
+
+# ONF bundle extension constants for OpenFlow 1.3 (EXT-230).
+ONF_BCT_OPEN_REQUEST = 0
+ONF_BCT_COMMIT_REQUEST = 4
+ONF_BF_ATOMIC = 1
+
+
+class FlowModBatch:
+    """One flushed group of FlowMods, closed by a barrier."""
+
+    __slots__ = ('batch_id', 'msgs', 'xids', 'barrier_xid', 'bundle_id',
+                 'bundle_open_xid', 'sent_at', 'completed_at', 'errors')
+
+    def __init__(self, batch_id, msgs):
+        self.batch_id = batch_id
+        self.msgs = msgs
+        self.xids = set()
+        self.barrier_xid = None
+        self.bundle_id = None
+        self.bundle_open_xid = None
+        self.sent_at = None
+        self.completed_at = None
+        self.errors = []  # [(xid, type, code)]
+
+    @property
+    def latency(self):
+        if self.completed_at is None:
+            return None
+        return self.completed_at - self.sent_at
+
+
+class FlowModBatcher:
+    """Per-datapath transmit layer for FlowMods.
+
+    FlowMods are buffered and flushed as a single socket write per batch
+    (optionally wrapped in an ONF atomic bundle), and every batch is closed
+    with an OFPBarrierRequest. The barrier reply marks the batch enforced;
+    OFPErrorMsgs are attributed to the batch that sent the failing xid.
+    """
+
+    _batch_ids = itertools.count(1)
+
+    def __init__(self, datapath, use_bundles=False, max_batch=1024):
+        self.datapath = datapath
+        self.use_bundles = use_bundles
+        self.max_batch = max_batch
+        self.pending = []
+        self.inflight = {}    # { barrier xid: FlowModBatch }
+        self._by_xid = {}     # { message xid: FlowModBatch } for error attribution
+
+        # Counters
+        self.batches_sent = 0
+        self.batches_completed = 0
+        self.msgs_sent = 0
+        self.errors = 0
+
+    def queue(self, msg):
+        self.pending.append(msg)
+
+    def flush(self):
+        """Send everything queued; returns the list of batches sent."""
+        batches = []
+        while self.pending:
+            msgs = self.pending[:self.max_batch]
+            del self.pending[:self.max_batch]
+            batches.append(self._send_batch(FlowModBatch(next(self._batch_ids), msgs)))
+        return batches
+
+    def barrier_reply(self, xid):
+        """Mark the batch closed by this barrier as enforced; returns it or None."""
+        batch = self.inflight.pop(xid, None)
+        if batch is None:
+            return None
+        batch.completed_at = time.time()
+        self.batches_completed += 1
+        for msg_xid in batch.xids:
+            self._by_xid.pop(msg_xid, None)
+        return batch
+
+    def error(self, xid, err_type, err_code):
+        """Attribute an OFPErrorMsg to its batch; returns the batch or None.
+
+        If the switch rejects opening the bundle (no bundle support), bundles
+        are disabled for this datapath and the batch's FlowMods are queued
+        again as plain messages.
+        """
+        batch = self._by_xid.get(xid)
+        if batch is None:
+            return None
+        batch.errors.append((xid, err_type, err_code))
+        self.errors += 1
+
+        if xid == batch.bundle_open_xid:
+            log.warning(f"Switch {self.datapath.id} rejected OpenFlow bundles "
+                        f"(type={err_type}, code={err_code}); falling back to plain FlowMods.")
+            self.use_bundles = False
+            for msg in batch.msgs:
+                msg.xid = None
+            self.pending[:0] = batch.msgs
+        return batch
+
+    def _send_batch(self, batch):
+        dp = self.datapath
+        ofp_parser = dp.ofproto_parser
+
+        out = list(batch.msgs)
+        if self.use_bundles:
+            batch.bundle_id = batch.batch_id & 0xFFFFFFFF
+            bundle_open = ofp_parser.ONFBundleCtrlMsg(dp, batch.bundle_id, ONF_BCT_OPEN_REQUEST,
+                                                      ONF_BF_ATOMIC, [])
+            dp.set_xid(bundle_open)
+            batch.bundle_open_xid = bundle_open.xid
+            # Inner FlowMods take the xid of their bundle-add wrapper
+            out = [bundle_open]
+            out += [ofp_parser.ONFBundleAddMsg(dp, batch.bundle_id, ONF_BF_ATOMIC, msg, [])
+                    for msg in batch.msgs]
+            out.append(ofp_parser.ONFBundleCtrlMsg(dp, batch.bundle_id, ONF_BCT_COMMIT_REQUEST,
+                                                   ONF_BF_ATOMIC, []))
+        barrier = ofp_parser.OFPBarrierRequest(dp)
+        out.append(barrier)
+
+        # Serialize everything into one buffer so the batch goes out as a
+        # single large write instead of one socket write per FlowMod.
+        buf = bytearray()
+        for msg in out:
+            if msg.xid is None:
+                dp.set_xid(msg)
+            msg.serialize()
+            buf += msg.buf
+            batch.xids.add(msg.xid)
+            self._by_xid[msg.xid] = batch
+        batch.barrier_xid = barrier.xid
+        batch.sent_at = time.time()
+        dp.send(bytes(buf))
+
+        self.inflight[barrier.xid] = batch
+        self.batches_sent += 1
+        self.msgs_sent += len(batch.msgs)
+        return batch
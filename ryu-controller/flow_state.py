@@ -0,0 +1,320 @@
+import functools
+import ipaddress
+
+
+# Instruction specs are hashable tuples of operations so desired and installed
+# flow entries can be compared directly; zt_controller turns them into
+# OpenFlow instructions. An empty spec means DROP.
+DROP = ()
+OUTPUT_NORMAL = (('normal',),)
+
+# Nicira extension subtype of NXActionResubmitTable (ryu.ofproto.nicira_ext)
+NXAST_RESUBMIT_TABLE = 14
+
+
+def goto_spec(table_id, metadata=None, mask=None):
+    """Instruction spec: optionally write metadata, then continue in table_id."""
+    if metadata is None:
+        return (('goto_table', table_id),)
+    return (('write_metadata', metadata, mask), ('goto_table', table_id))
+
+
+def resubmit_spec(table_id):
+    """Instruction spec: look the packet up again in table_id (may go back)."""
+    return (('resubmit', table_id),)
+
+
+def match_key(match_fields):
+    """Return a canonical, hashable form of an OFPMatch kwargs dict.
+
+    Flow entries are identified by (table_id, priority, match_key) so the
+    desired and installed flow sets can be diffed without comparing OFPMatch
+    objects. IPv4 fields are normalized to the form a switch reports them in
+    flow stats ("a.b.c.d" when exact, (addr, netmask) when masked, omitted
+    when fully wildcarded) so read-back flows compare equal to ours.
+    """
+    fields = {}
+    for field, value in match_fields.items():
+        if field in ('ipv4_src', 'ipv4_dst'):
+            value = normalize_ipv4(value)
+            if value is None:
+                continue
+        fields[field] = value
+    return tuple(sorted(fields.items()))
+
+
+def normalize_ipv4(value):
+    if isinstance(value, tuple):
+        value = f"{value[0]}/{value[1]}"
+    if '/' not in value:
+        return value
+    try:
+        net = ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        return value  # Leave it for the switch to reject
+    if net.prefixlen == 0:
+        return None
+    if net.prefixlen == net.max_prefixlen:
+        return str(net.network_address)
+    return (str(net.network_address), str(net.netmask))
+
+
+@functools.lru_cache(maxsize=65536)
+def _value_mask(field, value):
+    """Return (value, mask) ints for a match value; -1 is an exact mask."""
+    if field in ('ipv4_src', 'ipv4_dst'):
+        if isinstance(value, tuple):
+            return int(ipaddress.IPv4Address(value[0])), int(ipaddress.IPv4Address(value[1]))
+        return int(ipaddress.IPv4Address(value)), -1
+    if isinstance(value, tuple):
+        return value
+    return value, -1
+
+
+def match_covers(outer, inner):
+    """True if every packet matching `inner` also matches `outer`.
+
+    Both are match_key() tuples. A field missing from outer is wildcarded;
+    masked fields cover values whose masked bits agree.
+    """
+    inner = dict(inner)
+    for field, value in outer:
+        if field not in inner:
+            return False
+        inner_value = inner[field]
+        if value == inner_value:
+            continue
+        try:
+            value, mask = _value_mask(field, value)
+            inner_value, inner_mask = _value_mask(field, inner_value)
+        except (TypeError, ValueError):
+            return False
+        if inner_mask & mask != mask or inner_value & mask != value & mask:
+            return False
+    return True
+
+
+def _exact_ipv4(fields, field):
+    for name, value in fields:
+        if name == field:
+            return value if isinstance(value, str) else None
+    return None
+
+
+def flow_from_stats(stat, ofp):
+    """Convert an OFPFlowStats entry into (key, instructions spec).
+
+    Instructions we never install become an 'unknown' spec, so the flow
+    compares unequal to anything desired and gets overwritten or removed.
+    """
+    key = (stat.table_id, stat.priority, match_key(dict(stat.match.items())))
+    spec = []
+    for inst in stat.instructions:
+        if inst.type == ofp.OFPIT_APPLY_ACTIONS:
+            action = inst.actions[0] if len(inst.actions) == 1 else None
+            if getattr(action, 'port', None) == ofp.OFPP_NORMAL:
+                spec.append(('normal',))
+            elif getattr(action, 'subtype', None) == NXAST_RESUBMIT_TABLE:
+                spec.append(('resubmit', action.table_id))
+            elif inst.actions:
+                spec.append(('unknown',))
+        elif inst.type == ofp.OFPIT_WRITE_METADATA:
+            spec.append(('write_metadata', inst.metadata, inst.metadata_mask))
+        elif inst.type == ofp.OFPIT_GOTO_TABLE:
+            spec.append(('goto_table', inst.table_id))
+        else:
+            spec.append(('unknown',))
+    # Same op order goto_spec() produces
+    order = {'normal': 0, 'resubmit': 0, 'write_metadata': 1, 'goto_table': 2, 'unknown': 3}
+    spec.sort(key=lambda op: order[op[0]])
+    return key, tuple(spec)
+
+
+class DesiredFlowSet:
+    """Reference-counted set of desired ZT flows with change tracking.
+
+    Several policies (or several rows of one policy) can produce the same
+    (table_id, priority, match) entry, so each key is reference counted and
+    only reported as changed when it first appears or its last owner goes
+    away. Entries are placed in a scope: None means every switch, otherwise
+    the dpid of the one switch that should hold the flow.
+
+    Each entry also has an owner, the cookie slot of the policy its flow is
+    attributed to (0 = no single policy). A key shared by several owners
+    keeps its first owner until all of that owner's references are gone;
+    the next owner then takes over and the entry is marked dirty so the
+    flow is reinstalled with the new cookie.
+
+    With shadow elimination on, get() hides table-0 entries that can never
+    match on a switch because a higher-priority entry there (or one of
+    equal priority with the same instructions) covers their match. Adding
+    or removing a covering entry marks the entries it covers dirty so they
+    are installed or removed on the next sync.
+    """
+
+    SHADOW_TABLE = 0
+
+    def __init__(self, eliminate_shadowed=False):
+        self._flows = {}     # { scope: { (table_id, priority, match_key): [instructions, refs, owner, other owners] } }
+        self._dirty = set()  # (scope, key) pairs added/removed since the last pop_dirty()
+        self.eliminate_shadowed = eliminate_shadowed
+        # Shadow indexes over (scope, key) entries of SHADOW_TABLE, bucketed
+        # by exact ipv4_src/ipv4_dst so a lookup only scans entries that
+        # could cover or be covered by the key.
+        self._pairs = {}        # { (src, dst): entries with both exact }
+        self._src_broad = {}    # { src: entries with exact src, wildcard/masked dst }
+        self._dst_broad = {}    # { dst: entries with exact dst, wildcard/masked src }
+        self._wild = set()      # entries with neither address exact
+        self._by_src = {}       # { src: entries with exact src }
+        self._by_dst = {}       # { dst: entries with exact dst }
+
+    def __len__(self):
+        return sum(len(flows) for flows in self._flows.values())
+
+    def keys_for(self, dpid):
+        """Return every key desired on the given switch."""
+        keys = set(self._flows.get(None, ()))
+        keys.update(self._flows.get(dpid, ()))
+        return keys
+
+    def count_for(self, dpid):
+        return len(self.keys_for(dpid))
+
+    def count_upper_bound(self, dpid):
+        """O(1) upper bound of count_for(dpid) (keys in both scopes count twice)."""
+        return len(self._flows.get(None, ())) + (len(self._flows.get(dpid, ())) if dpid is not None else 0)
+
+    def get(self, key, dpid):
+        """Return the instructions for key on dpid, or None if not desired."""
+        entry = self._flows.get(dpid, {}).get(key) or self._flows.get(None, {}).get(key)
+        if entry is None:
+            return None
+        if self.eliminate_shadowed and self.shadowed_by(key, entry[0], dpid) is not None:
+            return None
+        return entry[0]
+
+    def owner(self, key, dpid):
+        """Return the owner (policy cookie slot) of key on dpid; 0 if none."""
+        entry = self._flows.get(dpid, {}).get(key) or self._flows.get(None, {}).get(key)
+        return entry[2] if entry is not None else 0
+
+    def shadowed_by(self, key, instructions, dpid):
+        """Return a desired key on dpid that makes key unreachable, or None."""
+        table_id, priority, fields = key
+        if table_id != self.SHADOW_TABLE:
+            return None
+        src = _exact_ipv4(fields, 'ipv4_src')
+        dst = _exact_ipv4(fields, 'ipv4_dst')
+        candidates = [self._wild]
+        if src is not None:
+            candidates.append(self._src_broad.get(src, ()))
+        if dst is not None:
+            candidates.append(self._dst_broad.get(dst, ()))
+        if src is not None and dst is not None:
+            candidates.append(self._pairs.get((src, dst), ()))
+        for bucket in candidates:
+            for scope, other in bucket:
+                if other == key or (scope is not None and scope != dpid):
+                    continue
+                other_priority = other[1]
+                if other_priority < priority:
+                    continue
+                if other_priority == priority and self._flows[scope][other][0] != instructions:
+                    continue
+                if match_covers(other[2], fields):
+                    return other
+        return None
+
+    def add(self, key, instructions, scope=None, owner=0):
+        flows = self._flows.setdefault(scope, {})
+        entry = flows.get(key)
+        if entry is None:
+            flows[key] = [instructions, 1, owner, None]
+            self._dirty.add((scope, key))
+            if self.eliminate_shadowed and key[0] == self.SHADOW_TABLE:
+                self._index(scope, key, True)
+        else:
+            entry[1] += 1
+            if owner != entry[2]:
+                others = entry[3] = entry[3] or {}
+                others[owner] = others.get(owner, 0) + 1
+
+    def discard(self, key, scope=None, owner=0):
+        flows = self._flows.get(scope)
+        entry = flows.get(key) if flows else None
+        if entry is None:
+            return
+        entry[1] -= 1
+        others = entry[3]
+        if others and entry[1] > 0:
+            if owner in others and owner != entry[2]:
+                others[owner] -= 1
+                if not others[owner]:
+                    del others[owner]
+            elif entry[1] == sum(others.values()):
+                # The owner's last reference is gone; hand the flow over
+                entry[2] = min(others)
+                del others[entry[2]]
+                self._dirty.add((scope, key))
+            if not others:
+                entry[3] = None
+        if entry[1] <= 0:
+            if self.eliminate_shadowed and key[0] == self.SHADOW_TABLE:
+                self._index(scope, key, False)
+            del flows[key]
+            if not flows:
+                del self._flows[scope]
+            self._dirty.add((scope, key))
+
+    def clear(self):
+        for scope, flows in self._flows.items():
+            self._dirty.update((scope, key) for key in flows)
+        self._flows.clear()
+        for index in (self._pairs, self._src_broad, self._dst_broad, self._by_src, self._by_dst):
+            index.clear()
+        self._wild.clear()
+
+    def _index(self, scope, key, add):
+        """Add/remove an entry in the shadow indexes.
+
+        Entries it covers may change visibility, so they are marked dirty
+        too. Only entries sharing its exact addresses can be covered, so
+        the scan stays small unless the entry wildcards both addresses.
+        """
+        fields = key[2]
+        src = _exact_ipv4(fields, 'ipv4_src')
+        dst = _exact_ipv4(fields, 'ipv4_dst')
+        if src is not None and dst is not None:
+            buckets = [self._pairs.setdefault((src, dst), set())]
+            covered = buckets[0]
+        elif src is not None:
+            buckets = [self._src_broad.setdefault(src, set())]
+            covered = self._by_src.get(src, ())
+        elif dst is not None:
+            buckets = [self._dst_broad.setdefault(dst, set())]
+            covered = self._by_dst.get(dst, ())
+        else:
+            buckets = [self._wild]
+            covered = [(s, k) for s, flows in self._flows.items() for k in flows
+                       if k[0] == self.SHADOW_TABLE]
+        if src is not None:
+            buckets.append(self._by_src.setdefault(src, set()))
+        if dst is not None:
+            buckets.append(self._by_dst.setdefault(dst, set()))
+
+        for other_scope, other in list(covered):
+            if other != key and other[1] <= key[1] and match_covers(fields, other[2]) \
+                    and (scope is None or other_scope in (None, scope)):
+                self._dirty.add((other_scope, other))
+
+        entry = (scope, key)
+        for bucket in buckets:
+            if add:
+                bucket.add(entry)
+            else:
+                bucket.discard(entry)
+
+    def pop_dirty(self):
+        """Return and reset the (scope, key) pairs changed since the last call."""
+        dirty, self._dirty = self._dirty, set()
+        return dirty
@@ -1,6 +1,10 @@
-from kazoo.client import KazooClient
+from kazoo.client import KazooClient, KazooState
 from kazoo.recipe.election import Election
+from kazoo.recipe.watchers import ChildrenWatch
+from kazoo.exceptions import NodeExistsError
 import logging
+import socket
+import threading
 import time
 import os
 
@@ -11,18 +15,48 @@ log = logging.getLogger(__name__)
 # Allow configuration of an ensemble (e.g., "zookeeper-1:2181,zookeeper-2:2181")
 ZK_HOSTS = os.environ.get("ZK_HOSTS", "zookeeper:2181")
 ELECTION_PATH = '/sdn/controller_election'
+MEMBERS_PATH = '/sdn/controller_members'
+# Stable identity for datapath sharding; must be unique per controller.
+ZT_CONTROLLER_ID = os.environ.get("ZT_CONTROLLER_ID", socket.gethostname())
+
+# Failover detection is bounded by the ZK session timeout: the next leader is
+# only elected once the dead leader's session expires. Kazoo heartbeats at a
+# fraction of the negotiated timeout, and the server clamps it to
+# [2, 20] x tickTime, so lower the server tickTime for sub-second values.
+ZK_SESSION_TIMEOUT = float(os.environ.get("ZK_SESSION_TIMEOUT", "2.0"))
+# Delay between connection attempts while ZooKeeper is unreachable.
+ZK_RETRY_DELAY = float(os.environ.get("ZK_RETRY_DELAY", "0.2"))
+ZK_RETRY_MAX_DELAY = float(os.environ.get("ZK_RETRY_MAX_DELAY", "2.0"))
+
+
+def znode_sequence(node):
+    """Return the sequence number Zookeeper appended to a sequential znode."""
+    return int(node[-10:])
+
+
+def make_zk_client():
+    retry = {'max_tries': -1, 'delay': ZK_RETRY_DELAY, 'max_delay': ZK_RETRY_MAX_DELAY}
+    return KazooClient(hosts=ZK_HOSTS, timeout=ZK_SESSION_TIMEOUT, connection_retry=retry)
 
 
 class ZKLeaderElection:
     def __init__(self, ryu_app):
         self.ryu_app = ryu_app
-        self.zk = KazooClient(hosts=ZK_HOSTS)
+        self.zk = make_zk_client()
+        self.zk.add_listener(self._connection_listener)
         self.election = None
         self.is_leader = False
+        # OpenFlow role generation id: the election znode sequence of the
+        # current leader. Sequence numbers only grow, so a newer leader
+        # always has a higher generation than a stale one.
+        self.generation_id = 0
+        self._leadership_lost = threading.Event()
 
     def start(self):
         self.zk.start()
-        log.info(f"Connecting to Zookeeper at {ZK_HOSTS}...")
+        log.info(f"Connecting to Zookeeper at {ZK_HOSTS} (session timeout {ZK_SESSION_TIMEOUT}s)...")
+        self.zk.ensure_path(ELECTION_PATH)
+        ChildrenWatch(self.zk, ELECTION_PATH, self._contenders_changed)
         self.election = Election(self.zk, ELECTION_PATH)
         # Start the election process.
         # election.run() calls become_leader() when this node wins, then BLOCKS
@@ -32,37 +66,138 @@ class ZKLeaderElection:
             try:
                 self.election.run(self.become_leader)
             except Exception as e:
-                log.error(f"Election error: {e}. Reconnecting in 5s...")
-                time.sleep(5)
+                log.error(f"Election error: {e}. Re-entering election in {ZK_RETRY_DELAY}s...")
+                time.sleep(ZK_RETRY_DELAY)
 
     def become_leader(self):
         """
         This function is called when this instance wins the election[cite: 40].
         We must block here (not return) while we want to stay master.
         """
-        log.info("--- I am now the MASTER controller ---")
+        self._leadership_lost.clear()
+        self.generation_id = znode_sequence(self.election.lock.node)
+        log.info(f"--- I am now the MASTER controller (generation {self.generation_id}) ---")
         self.is_leader = True
         # Tell the Ryu app it's now master
         if hasattr(self.ryu_app, 'set_master_role'):
             self.ryu_app.set_master_role(is_master=True)
-        
-        # Block here to hold leadership. Monitor ZK connection health.
-        try:
-            while self.zk.connected:
-                time.sleep(1)
-        except Exception as e:
-            log.error(f"Leadership monitoring error: {e}")
-        
+
+        # Block here to hold leadership until the connection listener
+        # reports that the ZK session is suspended or lost.
+        if self.zk.connected:
+            self._leadership_lost.wait()
+
         # If we exit this function, we've lost leadership
         log.info("--- Lost leadership, transitioning to SLAVE ---")
         self.is_leader = False
         if hasattr(self.ryu_app, 'set_master_role'):
             self.ryu_app.set_master_role(is_master=False)
 
+    def _connection_listener(self, state):
+        """Kazoo connection state listener; must not block."""
+        if state == KazooState.CONNECTED:
+            log.info("Zookeeper session connected.")
+            return
+        # SUSPENDED: no heartbeat for a while; the session may still expire and
+        # another controller take over, so step down without waiting for it.
+        # LOST: the session expired and our election znode is gone.
+        log.warning(f"Zookeeper session {state}.")
+        self._leadership_lost.set()
+
+    def _contenders_changed(self, children):
+        """Track the current leader's generation (lowest election sequence)."""
+        if children:
+            leader_generation = min(znode_sequence(c) for c in children)
+            if not self.is_leader:
+                self.generation_id = leader_generation
+
     def stop(self):
+        self._leadership_lost.set()
         if self.election:
             self.election.cancel()  # Cleanly leave election
         if self.zk:
             self.zk.stop()
 
 
+class ZKShardMembership:
+    """Datapath sharding across all live controllers.
+
+    Every controller registers an ephemeral znode under MEMBERS_PATH and is
+    MASTER for the datapaths a consistent hash ring over the live members
+    maps to it, SLAVE for the rest. The ring is rebuilt whenever a member
+    joins or leaves; see ZeroTrustController.set_shard_members().
+    """
+
+    def __init__(self, ryu_app):
+        self.ryu_app = ryu_app
+        self.member_id = ZT_CONTROLLER_ID
+        self.zk = make_zk_client()
+        self.zk.add_listener(self._connection_listener)
+        self.members = None
+        self._watch = None
+        # OpenFlow role generation id: the child version of MEMBERS_PATH,
+        # which ZooKeeper bumps on every join/leave. Every controller sees
+        # the same value for the same membership, and a controller acting on
+        # an older membership is rejected by the switch as stale.
+        self.generation_id = 0
+        self._state_changed = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.zk.start()
+        log.info(f"Joining controller group at {ZK_HOSTS} as '{self.member_id}'...")
+        while True:
+            self._state_changed.clear()
+            try:
+                if self.zk.connected:
+                    self.zk.ensure_path(MEMBERS_PATH)
+                    self._join()
+                    if self._watch is None:
+                        self._watch = ChildrenWatch(self.zk, MEMBERS_PATH, self._apply)
+                    else:
+                        self._apply(self.zk.get_children(MEMBERS_PATH))
+                else:
+                    # Other controllers take our datapaths once our session
+                    # expires; stop writing to them now.
+                    self._apply(None)
+            except Exception as e:
+                log.error(f"Group membership error: {e}. Retrying in {ZK_RETRY_DELAY}s...")
+                time.sleep(ZK_RETRY_DELAY)
+                continue
+            self._state_changed.wait()
+
+    def _join(self):
+        path = f"{MEMBERS_PATH}/{self.member_id}"
+        try:
+            self.zk.create(path, ephemeral=True)
+        except NodeExistsError:
+            stat = self.zk.exists(path)
+            if stat is not None and stat.ephemeralOwner != self.zk.client_id[0]:
+                # A previous incarnation's session has not expired yet
+                raise RuntimeError(f"member id '{self.member_id}' is still registered by another session")
+
+    def _apply(self, children):
+        """Recompute our shard for the given membership (None = disconnected)."""
+        with self._lock:
+            if children is not None and self.member_id in children:
+                members = tuple(sorted(children))
+                generation_id = self.zk.exists(MEMBERS_PATH).cversion
+            else:
+                members, generation_id = (), self.generation_id
+            if members == self.members and generation_id == self.generation_id:
+                return
+            log.info(f"Controller group (generation {generation_id}): {list(members)}")
+            self.members = members
+            self.generation_id = generation_id
+            if hasattr(self.ryu_app, 'set_shard_members'):
+                self.ryu_app.set_shard_members(members)
+
+    def _connection_listener(self, state):
+        """Kazoo connection state listener; must not block."""
+        if state != KazooState.CONNECTED:
+            log.warning(f"Zookeeper session {state}.")
+        self._state_changed.set()
+
+    def stop(self):
+        if self.zk:
+            self.zk.stop()
@@ -1,13 +1,29 @@
 from kubernetes import config, client, watch
+from kubernetes.client.rest import ApiException
 from ryu.base import app_manager
 from ryu.controller import event
 from ryu.lib import hub
 import logging
+import os
 import time
 
 
 log = logging.getLogger(__name__)
 
+# Only watch Pods that policies can reference: a comma-separated namespace
+# list (empty = all namespaces) and a Kubernetes label selector applied
+# server-side (e.g. "zt.example.com/managed=true").
+K8S_NAMESPACES = [ns.strip() for ns in os.environ.get("K8S_NAMESPACES", "").split(',') if ns.strip()]
+K8S_LABEL_SELECTOR = os.environ.get("K8S_LABEL_SELECTOR", "")
+# Server-side watch timeout; the watch then resumes from the last
+# resourceVersion without relisting.
+K8S_WATCH_TIMEOUT = int(os.environ.get("K8S_WATCH_TIMEOUT", "300"))
+# Backoff between attempts while the API server is unreachable.
+K8S_RETRY_DELAY = float(os.environ.get("K8S_RETRY_DELAY", "1.0"))
+K8S_RETRY_MAX_DELAY = float(os.environ.get("K8S_RETRY_MAX_DELAY", "30.0"))
+
+HTTP_GONE = 410  # resourceVersion too old: the watch cannot resume
+
 
 # --- Custom Ryu Events ---
 # [cite_start]These bridge the K8s watcher thread to the Ryu event loop [cite: 151]
@@ -20,13 +36,172 @@ class EventK8sPodUpdate(event.EventBase):
         self.node = node
 
 
+class EventK8sPodsSynced(event.EventBase):
+    """Every watched namespace has been listed once (or K8s is not configured)."""
+    def __init__(self):
+        super(EventK8sPodsSynced, self).__init__()
+
+
+def pod_key(pod):
+    return f"{pod.metadata.namespace}/{pod.metadata.name}"
+
+
+def pod_state(pod):
+    """Return (ip, labels, node) for a Pod policies can match, else None.
+
+    Pods without an IP or without labels cannot be selected by label
+    selectors, so they are treated as absent.
+    """
+    ip = pod.status.pod_ip if pod.status else None
+    labels = pod.metadata.labels
+    if not ip or not labels:
+        return None
+    return ip, dict(labels), pod.spec.node_name if pod.spec else None
+
+
+class PodInformer:
+    """List-then-watch cache of the Pods in one namespace (None = all).
+
+    Lists once, then watches from the list's resourceVersion and resumes
+    from the last seen one after timeouts and errors. Only a 410 Gone
+    (resourceVersion compacted away) triggers a relist, which is diffed
+    against the cache. Events are emitted only when a Pod's IP, labels or
+    node actually change, keyed by IP as the controller expects.
+    on_synced is called once, after the first list has been emitted.
+    """
+
+    def __init__(self, v1, namespace, label_selector, emit, on_synced=None):
+        self.v1 = v1
+        self.namespace = namespace
+        self.label_selector = label_selector
+        self.emit = emit
+        self.on_synced = on_synced
+        self.synced = False
+        self.pods = {}    # { "namespace/name": (ip, labels, node) }
+        self.by_ip = {}   # { ip: {"namespace/name", ...} }; IPs can be reused before the old Pod's delete
+        self.resource_version = None
+        self.last_seen_at = None  # last list, event or bookmark from the API server
+
+        # Counters
+        self.relists = 0
+        self.watches = 0
+        self.events_received = 0
+        self.events_emitted = 0
+
+    @property
+    def scope(self):
+        return f"namespace {self.namespace}" if self.namespace else "all namespaces"
+
+    def _list_call(self):
+        # Passed to Watch.stream() unwrapped: it reads the function's
+        # docstring to deserialize events into V1Pod objects.
+        if self.namespace is None:
+            return self.v1.list_pod_for_all_namespaces, ()
+        return self.v1.list_namespaced_pod, (self.namespace,)
+
+    def run(self):
+        delay = K8S_RETRY_DELAY
+        while True:
+            try:
+                if self.resource_version is None:
+                    self.relist()
+                self.watch()
+                delay = K8S_RETRY_DELAY
+            except ApiException as e:
+                if e.status == HTTP_GONE:
+                    log.info(f"K8s watch of {self.scope}: resourceVersion {self.resource_version} "
+                             f"expired; relisting.")
+                    self.resource_version = None
+                    continue
+                log.error(f"K8s watch of {self.scope} failed: {e.status} {e.reason}. "
+                          f"Retrying in {delay}s...")
+                hub.sleep(delay)
+                delay = min(delay * 2, K8S_RETRY_MAX_DELAY)
+            except Exception as e:
+                log.error(f"K8s watch of {self.scope} error: {e}. Retrying in {delay}s...")
+                hub.sleep(delay)
+                delay = min(delay * 2, K8S_RETRY_MAX_DELAY)
+
+    def relist(self):
+        """List all Pods, diff against the cache and emit only the differences."""
+        func, args = self._list_call()
+        pod_list = func(*args, label_selector=self.label_selector)
+        fresh = {}
+        for pod in pod_list.items:
+            state = pod_state(pod)
+            if state is not None:
+                fresh[pod_key(pod)] = state
+        for key in list(self.pods.keys() - fresh.keys()):
+            self.apply(key, None)
+        for key, state in fresh.items():
+            self.apply(key, state)
+        self.resource_version = pod_list.metadata.resource_version
+        self.last_seen_at = time.time()
+        self.relists += 1
+        log.info(f"K8s list of {self.scope}: {len(self.pods)} Pods at resourceVersion {self.resource_version}.")
+        if not self.synced:
+            self.synced = True
+            if self.on_synced:
+                self.on_synced()
+
+    def watch(self):
+        """Stream changes from resource_version until the server closes the watch."""
+        func, args = self._list_call()
+        self.watches += 1
+        stream = watch.Watch().stream(func, *args,
+                                      label_selector=self.label_selector,
+                                      resource_version=self.resource_version,
+                                      timeout_seconds=K8S_WATCH_TIMEOUT,
+                                      allow_watch_bookmarks=True)
+        for ev in stream:
+            # From the raw object: newer clients do not deserialize bookmarks
+            self.resource_version = ev['raw_object']['metadata']['resourceVersion']
+            self.last_seen_at = time.time()
+            if ev['type'] == 'BOOKMARK':
+                continue  # Progress marker only
+            pod = ev['object']
+            self.events_received += 1
+            self.apply(pod_key(pod), None if ev['type'] == 'DELETED' else pod_state(pod))
+        # The server closed the watch on time: nothing was missed until now
+        self.last_seen_at = time.time()
+
+    def apply(self, key, state):
+        """Update the cache for one Pod and emit what changed for the controller."""
+        old = self.pods.get(key)
+        if state == old:
+            return
+        if state is None:
+            del self.pods[key]
+        else:
+            self.pods[key] = state
+            self.by_ip.setdefault(state[0], set()).add(key)
+
+        if old is not None and (state is None or state[0] != old[0]):
+            owners = self.by_ip[old[0]]
+            owners.discard(key)
+            if owners:
+                # Another Pod already holds this IP; it now owns the entry
+                self._emit('MODIFIED', self.pods[next(iter(owners))])
+            else:
+                del self.by_ip[old[0]]
+                self._emit('DELETED', old)
+        if state is not None:
+            self._emit('ADDED' if old is None or old[0] != state[0] else 'MODIFIED', state)
+
+    def _emit(self, event_type, state):
+        pod_ip, labels, node = state
+        self.events_emitted += 1
+        log.info(f"K8s Event: {event_type} Pod {pod_ip} with labels {labels}")
+        self.emit(event_type, pod_ip, labels, node)
+
+
 class K8sWatcher:
     def __init__(self, ryu_app):
         self.ryu_app = ryu_app
         self.k8s_available = False
         self.v1 = None
-        self.watcher = None
-        
+        self.informers = []
+
         try:
             # Load in-cluster config when running as a Pod [cite: 128]
             config.load_incluster_config()
@@ -41,52 +216,47 @@ class K8sWatcher:
             except (config.ConfigException, FileNotFoundError) as e:
                 log.warning(f"Kubernetes config not available: {e}. "
                            f"K8s watcher will run in stub mode (no Pod events).")
-        
+
         if self.k8s_available:
             self.v1 = client.CoreV1Api()
-            self.watcher = watch.Watch()
 
     def start(self):
-        log.info("Starting Kubernetes Pod event watcher...")
-        # Run the watch loop in a separate green thread
-        hub.spawn(self._watch_pods)
-
-    def _watch_pods(self):
         """
-        Watch stream for K8s Pod events[cite: 134].
-        If K8s is not available, this becomes a no-op stub.
+        Start one Pod informer per watched namespace[cite: 134].
+        If K8s is not available, this is a no-op stub.
         """
         if not self.k8s_available:
+            # Controller can still use ip_block policies
             log.info("K8s watcher running in stub mode (no Kubernetes config).")
-            # Sleep indefinitely; controller can still use ip_block policies
-            while True:
-                time.sleep(60)
+            self.ryu_app.send_event_to_observers(EventK8sPodsSynced())  # Nothing to list
             return
-        
-        while True:
-            try:
-                stream = self.watcher.stream(self.v1.list_pod_for_all_namespaces)
-                for event in stream:
-                    pod = event['object']
-                    event_type = event['type']  # ADDED, MODIFIED, DELETED
-                    
-                    if not pod.status.pod_ip:
-                        continue  # Skip pods without an IP
-                        
-                    pod_ip = pod.status.pod_ip
-                    labels = pod.metadata.labels
-                    node = pod.spec.node_name
-                    
-                    if labels:
-                        log.info(f"K8s Event: {event_type} Pod {pod_ip} with labels {labels}")
-                        # Emit a custom Ryu event to the main app [cite: 153]
-                        custom_event = EventK8sPodUpdate(
-                            event_type, pod_ip, labels, node
-                        )
-                        self.ryu_app.send_event_to_observers(custom_event)
-                        
-            except Exception as e:
-                log.error(f"K8s watch stream error: {e}. Reconnecting...")
-                time.sleep(5)
 
+        log.info(f"Starting Kubernetes Pod informers (namespaces: {K8S_NAMESPACES or 'all'}, "
+                 f"label selector: {K8S_LABEL_SELECTOR or 'none'})...")
+        for namespace in K8S_NAMESPACES or [None]:
+            informer = PodInformer(self.v1, namespace, K8S_LABEL_SELECTOR, self._emit,
+                                   self._informer_synced)
+            self.informers.append(informer)
+            hub.spawn(informer.run)
+
+    def synced_at(self):
+        """When the Pod cache was last confirmed current (oldest informer).
+
+        None until every informer has listed; now in stub mode, where there
+        are no Pods to go stale.
+        """
+        if not self.k8s_available:
+            return time.time()
+        seen = [informer.last_seen_at for informer in self.informers]
+        if not seen or None in seen:
+            return None
+        return min(seen)
+
+    def _informer_synced(self):
+        if all(informer.synced for informer in self.informers):
+            log.info(f"K8s Pod cache synced: {sum(len(i.pods) for i in self.informers)} Pods.")
+            self.ryu_app.send_event_to_observers(EventK8sPodsSynced())
 
+    def _emit(self, event_type, pod_ip, labels, node):
+        # Emit a custom Ryu event to the main app [cite: 153]
+        self.ryu_app.send_event_to_observers(EventK8sPodUpdate(event_type, pod_ip, labels, node))
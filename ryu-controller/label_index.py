@@ -0,0 +1,83 @@
+import logging
+
+
+log = logging.getLogger(__name__)
+
+
+class LabelIndex:
+    """Inverted index of Pod labels used to resolve label selectors.
+
+    Maintains (key, value) -> set of Pod IPs so a selector is resolved by
+    intersecting a handful of small sets instead of scanning every Pod.
+    Resolved selectors are memoized; a memo entry is only invalidated when a
+    Pod carrying one of that selector's (key, value) pairs changes.
+    """
+
+    def __init__(self):
+        self.pod_labels = {}   # { "10.1.1.5": {"app": "frontend", ...} }
+        self._index = {}       # { ("app", "frontend"): {"10.1.1.5", ...} }
+        self._memo = {}        # { frozenset(selector items): frozenset(ips) }
+        self._memo_by_label = {}  # { ("app", "frontend"): {memo keys} }
+
+    def update(self, pod_ip, labels):
+        """Add or replace a Pod's labels."""
+        old = self.pod_labels.get(pod_ip, {})
+        labels = dict(labels or {})
+        if pod_ip in self.pod_labels and old == labels:
+            return
+        self._unindex(pod_ip, old)
+        self.pod_labels[pod_ip] = labels
+        for item in labels.items():
+            self._index.setdefault(item, set()).add(pod_ip)
+        self._invalidate(old.items() | labels.items())
+
+    def remove(self, pod_ip):
+        """Drop a Pod from the index."""
+        old = self.pod_labels.pop(pod_ip, None)
+        if old is None:
+            return
+        self._unindex(pod_ip, old)
+        self._invalidate(old.items())
+
+    def resolve(self, label_selector):
+        """Return the frozenset of Pod IPs whose labels contain the selector.
+
+        label_selector is a dict or a frozenset of its (key, value) items.
+        """
+        key = label_selector if isinstance(label_selector, frozenset) else frozenset(label_selector.items())
+        if not key:
+            return frozenset(self.pod_labels)  # Empty selector matches every Pod
+        ips = self._memo.get(key)
+        if ips is not None:
+            return ips
+
+        # Intersect the smallest sets first so the working set only shrinks.
+        sets = sorted((self._index.get(item, ()) for item in key), key=len)
+        if not sets[0]:
+            ips = frozenset()
+        else:
+            result = set(sets[0])
+            for s in sets[1:]:
+                result &= s
+                if not result:
+                    break
+            ips = frozenset(result)
+
+        self._memo[key] = ips
+        for item in key:
+            self._memo_by_label.setdefault(item, set()).add(key)
+        return ips
+
+    def _unindex(self, pod_ip, labels):
+        for item in labels.items():
+            ips = self._index.get(item)
+            if ips is None:
+                continue
+            ips.discard(pod_ip)
+            if not ips:
+                del self._index[item]
+
+    def _invalidate(self, items):
+        for item in items:
+            for key in self._memo_by_label.pop(item, ()):
+                self._memo.pop(key, None)
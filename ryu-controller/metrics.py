@@ -0,0 +1,78 @@
+# Prometheus metrics for the ZeroTrustController Ryu app.
+from prometheus_client import start_http_server, Counter, Gauge, Histogram
+import logging
+import os
+
+
+log = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "8080"))
+
+# Reconciliation hot path
+reconcile_duration = Histogram(
+    'zt_reconcile_duration_seconds',
+    'Time spent computing and queueing a reconcile', ['kind'])
+selector_resolution = Histogram(
+    'zt_selector_resolution_seconds',
+    'Time to resolve one policy selector to Pod IPs',
+    buckets=(1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 0.01, 0.05, 0.1))
+
+# Reconcile coalescing (see ReconcileScheduler)
+reconcile_triggers = Counter('zt_reconcile_triggers_total', 'Pod/policy/full reconcile triggers received')
+reconcile_triggers_coalesced = Counter(
+    'zt_reconcile_triggers_coalesced_total',
+    'Triggers merged into a reconcile that was already pending')
+reconciles = Counter('zt_reconciles_total', 'Merged reconciles run', ['kind'])
+reconcile_lag = Histogram(
+    'zt_reconcile_lag_seconds',
+    'Time from the oldest pending trigger to the merged reconcile that handled it',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+
+# OpenFlow traffic per datapath
+flowmods = Counter('zt_flowmods_total', 'ZT flow adds/modifies sent', ['dpid'])
+flow_deletes = Counter('zt_flow_deletes_total', 'ZT flow deletes sent', ['dpid'])
+barriers = Counter('zt_barrier_replies_total', 'Barrier replies received (FlowMod batches enforced)', ['dpid'])
+openflow_errors = Counter('zt_openflow_errors_total', 'OFPErrorMsgs received', ['dpid', 'type'])
+
+# Controller state
+pods = Gauge('zt_pods', 'Pods known to the controller')
+policies = Gauge('zt_policies', 'ENABLED policies loaded')
+desired_flows = Gauge('zt_desired_flows', 'ZT flows desired on a switch (after placement and shadowing)', ['dpid'])
+master = Gauge('zt_controller_master', '1 if this controller is MASTER (for any switch when sharding)')
+owned_datapaths = Gauge('zt_owned_datapaths', 'Connected switches this controller programs')
+event_queue_depth = Gauge('zt_event_queue_depth', 'Events waiting in the Ryu app event queue')
+
+# Warm standby
+standby_staleness = Gauge(
+    'zt_standby_state_staleness_seconds',
+    'Seconds since the applied state was last confirmed current: source="policy" against '
+    'the PostgreSQL policy revision, source="pods" by the K8s Pod watch (list, event or bookmark)',
+    ['source'])
+standby_ready = Gauge(
+    'zt_standby_ready',
+    '1 if policy state is loaded and compiled, so a takeover needs no DB load')
+
+# Flow table budget
+flows_installed = Gauge(
+    'zt_flows_installed',
+    'ZT_COOKIE flows installed on a switch', ['dpid'])
+flow_table_occupancy = Gauge(
+    'zt_flow_table_occupancy_ratio',
+    'Installed ZT flows divided by the switch flow budget (0 if unlimited)', ['dpid'])
+flows_over_budget = Gauge(
+    'zt_flows_over_budget',
+    'Desired ZT flows left uninstalled to stay within the switch flow budget', ['dpid'])
+
+# Per-policy hits, from flow stats polls (see policy_stats.py)
+policy_packets = Counter('zt_policy_packets_total', 'Packets matched by a policy\'s ZT flows', ['policy'])
+policy_bytes = Counter('zt_policy_bytes_total', 'Bytes matched by a policy\'s ZT flows', ['policy'])
+
+
+
+def start_exporter():
+    """Expose /metrics; failures are logged so the controller keeps running."""
+    try:
+        start_http_server(METRICS_PORT)
+        log.info(f"Started Prometheus metrics endpoint on port {METRICS_PORT}.")
+    except OSError as e:
+        log.error(f"Failed to start metrics endpoint on port {METRICS_PORT}: {e}")
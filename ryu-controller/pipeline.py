@@ -0,0 +1,155 @@
+import ipaddress
+import logging
+
+from flow_state import DROP, goto_spec, match_key, resubmit_spec
+
+
+log = logging.getLogger(__name__)
+
+# Table layout of the optional multi-table pipeline.
+TABLE_CLASSIFY_SRC = 0
+TABLE_CLASSIFY_DST = 1
+TABLE_ENFORCE = 2
+
+# Source tags live in the upper half of the 64-bit metadata register and
+# destination tags in the lower half, one bit per distinct IP set.
+TAG_BITS = 32
+SRC_TAG_MASK = ((1 << TAG_BITS) - 1) << TAG_BITS
+DST_TAG_MASK = (1 << TAG_BITS) - 1
+
+# The CNI's own rules in table 0, which the priority-override model assumes
+# at priority 100. Policies at or below it lose to them in flat mode, so they
+# stay flat rows here too instead of being enforced by the pipeline.
+CNI_PRIORITY = 100
+
+# Source classifiers sit above every CNI rule and flat DENY row so tagged
+# traffic always enters the pipeline, but only match metadata 0, i.e. the
+# first table-0 lookup. Traffic the pipeline does not drop is resubmitted to
+# table 0, where the classifiers no longer match and the CNI's rules and flat
+# DENY rows apply by their own priorities, exactly as without the pipeline.
+# Longer prefixes get higher priority; the resubmit is a Nicira (OVS)
+# extension action.
+CLASSIFY_PRIORITY_BASE = 0xFFFF - 32
+
+class PipelineCompiler:
+    """Compiles DENY policies into a classify/classify/enforce pipeline.
+
+    Table 0 tags source IPs with a metadata bit per distinct source set,
+    table 1 does the same for destinations, and table 2 matches
+    (src tag, dst tag, L4) to drop. Rule count therefore grows with
+    pods + policies instead of their product. Only 32 distinct sets fit per
+    direction; lower-priority policies beyond that, and policies that do not
+    outrank the CNI, are left unhandled and the controller installs them as
+    flat src x dst rows instead.
+    """
+
+    def compile(self, members, service_templates, placement=None):
+        """Compile materialized policies into pipeline flows.
+
+        members: iterable of (policy, src_ips, dst_ips).
+        service_templates: callable returning a policy's L4 match dicts.
+        placement: optional callable mapping a source IP to the dpid of the
+            switch hosting it (or None for every switch); source classifiers
+            are only installed there.
+        Returns ({ (scope, (table_id, priority, match_key)): instructions },
+                 set of policy ids handled by the pipeline,
+                 { (scope, key): policy } for the enforce flows, so their
+                 stats can be attributed,
+                 { policy id: {(scope, key)} } the enforce flows and
+                 classifiers each policy needs, so a flow budget can keep
+                 or drop a policy as a whole).
+        Policies sharing an enforce flow are attributed to the first of them.
+        """
+        src_bits = {}  # { frozenset(src_ips): bit }
+        dst_bits = {}  # { frozenset(dst_ips): bit }
+        rules = []
+        handled = set()
+        units = {}
+
+        # Highest priority first so those policies get tags before we run out.
+        for policy, src_ips, dst_ips in sorted(members, key=lambda m: -m[0].priority):
+            if policy.priority <= CNI_PRIORITY:
+                continue  # Flat rows, so the CNI's rules still win
+            if not src_ips or not dst_ips:
+                handled.add(policy.id)  # Nothing to enforce yet
+                continue
+            src_bit = self._allocate(src_bits, frozenset(src_ips))
+            dst_bit = self._allocate(dst_bits, frozenset(dst_ips))
+            if src_bit is None or dst_bit is None:
+                continue
+            handled.add(policy.id)
+            rules.append((policy, src_bit, dst_bit))
+
+        flows = {}
+        owners = {}
+        src_users = {}  # { bit: policy ids tagged by it }
+        dst_users = {}
+        for policy, src_bit, dst_bit in rules:
+            src_users.setdefault(src_bit, []).append(policy.id)
+            dst_users.setdefault(dst_bit, []).append(policy.id)
+            units[policy.id] = set()
+        # Traffic that is not tagged in a table, or not dropped in the last
+        # one, goes back to table 0 for the CNI's rules and flat rows.
+        flows[(None, (TABLE_CLASSIFY_DST, 0, match_key({})))] = resubmit_spec(TABLE_CLASSIFY_SRC)
+        flows[(None, (TABLE_ENFORCE, 0, match_key({})))] = resubmit_spec(TABLE_CLASSIFY_SRC)
+
+        self._classifiers(flows, units, src_users, TABLE_CLASSIFY_SRC, 'ipv4_src', src_bits,
+                          TAG_BITS, SRC_TAG_MASK, TABLE_CLASSIFY_DST, placement, {'metadata': 0})
+        self._classifiers(flows, units, dst_users, TABLE_CLASSIFY_DST, 'ipv4_dst', dst_bits,
+                          0, DST_TAG_MASK, TABLE_ENFORCE, None, {})
+
+        for policy, src_bit, dst_bit in rules:
+            tag = (src_bit << TAG_BITS) | dst_bit
+            for template in service_templates(policy):
+                fields = {'eth_type': 0x0800, 'metadata': (tag, tag)}
+                fields.update(template)
+                entry = (None, (TABLE_ENFORCE, policy.priority, match_key(fields)))
+                flows[entry] = DROP
+                owners.setdefault(entry, policy)
+                units[policy.id].add(entry)
+
+        return flows, handled, owners, units
+
+    @staticmethod
+    def _allocate(bits, ip_set):
+        bit = bits.get(ip_set)
+        if bit is None and len(bits) < TAG_BITS:
+            bit = bits[ip_set] = 1 << len(bits)
+        return bit
+
+    @staticmethod
+    def _classifiers(flows, units, bit_users, table_id, field, set_bits, shift, mask, next_table,
+                     placement, extra_fields):
+        """Emit one classifier flow per distinct address in the tagged sets.
+
+        An address also inherits the tags of every CIDR that contains it,
+        because its longer-prefix classifier shadows the CIDR's classifier.
+        Each flow is added to the unit of every policy using one of its tags.
+        """
+        own_bits = {}
+        for ip_set, bit in set_bits.items():
+            for ip in ip_set:
+                own_bits[ip] = own_bits.get(ip, 0) | bit
+
+        networks = {}
+        for ip in own_bits:
+            try:
+                networks[ip] = ipaddress.ip_network(ip, strict=False)
+            except ValueError:
+                log.warning(f"Skipping unparseable address '{ip}' in pipeline classifier.")
+        cidrs = [(net, own_bits[ip]) for ip, net in networks.items() if net.num_addresses > 1]
+
+        for ip, net in networks.items():
+            bits = own_bits[ip]
+            for cidr, cidr_bits in cidrs:
+                if net != cidr and net.version == cidr.version and net.subnet_of(cidr):
+                    bits |= cidr_bits
+            priority = CLASSIFY_PRIORITY_BASE + net.prefixlen
+            fields = {'eth_type': 0x0800, field: ip, **extra_fields}
+            scope = placement(ip) if placement else None
+            entry = (scope, (table_id, priority, match_key(fields)))
+            flows[entry] = goto_spec(next_table, bits << shift, mask)
+            for bit, policy_ids in bit_users.items():
+                if bits & bit:
+                    for policy_id in policy_ids:
+                        units[policy_id].add(entry)
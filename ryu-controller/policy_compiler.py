@@ -0,0 +1,196 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+
+from flow_state import normalize_ipv4
+
+
+log = logging.getLogger(__name__)
+
+# Map protocol string to OpenFlow IP protocol number
+IP_PROTO = {'TCP': 6, 'UDP': 17, 'ICMP': 1}
+# Destination port match field per protocol
+L4_DST_FIELD = {'TCP': 'tcp_dst', 'UDP': 'udp_dst'}
+
+ETH_TYPE_IPV4 = ('eth_type', 0x0800)
+
+# Merge a policy's ports into masked tcp_dst/udp_dst matches where the set
+# covers whole aligned blocks (e.g. 8080-8083 -> 8080/0xfffc). Port masks
+# are an OVS extension to OF1.3, so this is opt-in.
+ZT_PORT_MASKS = os.environ.get("ZT_PORT_MASKS", "0") == "1"
+
+
+@functools.lru_cache(maxsize=65536)
+def _ipv4_items(field, value):
+    """Match item(s) for one IPv4 address or CIDR, in match_key() form."""
+    value = normalize_ipv4(value)
+    return () if value is None else ((field, value),)
+
+
+def port_matches(ports, use_masks=False):
+    """Return tcp/udp_dst match values covering exactly the given ports.
+
+    Without masks each port is its own value; with masks runs of ports are
+    split into aligned (value, mask) blocks, and single ports stay plain.
+    """
+    ports = sorted(set(ports))
+    if not use_masks:
+        return ports
+    values = []
+    i = 0
+    while i < len(ports):
+        lo = hi = ports[i]
+        while i + 1 < len(ports) and ports[i + 1] == hi + 1:
+            i += 1
+            hi = ports[i]
+        i += 1
+        while lo <= hi:
+            size = lo & -lo if lo else 1 << 16
+            while size > hi - lo + 1:
+                size >>= 1
+            values.append(lo if size == 1 else (lo, 0xFFFF ^ (size - 1)))
+            lo += size
+    return values
+
+
+def policy_cookie(policy_id):
+    """Cookie slot (upper 32 bits of the flow cookie) for a policy's flows.
+
+    A hash of the id, so every controller derives the same slot without
+    coordination. Slot 0 is left for flows no single policy owns (pipeline
+    classifiers); two policies can collide with odds ~n^2/2^33, in which
+    case their stats are merged.
+    """
+    return int.from_bytes(hashlib.md5(policy_id.encode()).digest()[:4], 'big') or 1
+
+
+class CompiledSelector:
+    """A policy source/destination selector, parsed once."""
+
+    __slots__ = ('ip_block', 'labels', 'label_items')
+
+    def __init__(self, selector):
+        selector = selector or {}
+        self.ip_block = selector.get('ip_block') or None
+        self.labels = dict(selector.get('label_selector') or {})
+        self.label_items = frozenset(self.labels.items())
+
+    def matches(self, pod_ip, pod_labels):
+        """Check a single Pod against this selector."""
+        if self.ip_block == pod_ip:
+            return True
+        if not self.label_items:
+            return False
+        return self.label_items <= pod_labels.items()
+
+
+class CompiledPolicy:
+    """ORM-free, precompiled form of a PolicyDB row.
+
+    Holds parsed selectors and, per service, the parts of the flat-row match
+    key that do not depend on the (src, dst) pair. match_key() sorts fields
+    by name, and the IPv4 fields sort between ip_proto and the L4 port
+    fields, so a row key is prefix + ipv4 items + suffix with no sorting.
+    """
+
+    __slots__ = ('id', 'cookie', 'name', 'priority', 'action', 'deny', 'status', 'version',
+                 'src', 'dst', 'label_items', 'service_count', 'l4_templates', '_key_parts')
+
+    def __init__(self, row, version):
+        self.id = row.id
+        self.cookie = policy_cookie(row.id)
+        self.name = row.name
+        self.priority = row.priority
+        self.action = row.action
+        self.deny = row.action == "DENY"  # Read in the reconcile loop
+        self.status = row.status
+        self.version = version
+        self.src = CompiledSelector(row.source)
+        self.dst = CompiledSelector(row.destination)
+        self.label_items = self.src.label_items | self.dst.label_items
+
+        # Blueprint section 2.7: L4 protocol/port matching. A policy without
+        # services yields a single empty template (match all traffic).
+        # Redundant services are dropped: duplicates, ports of a protocol the
+        # policy also matches without a port, and everything if any service
+        # has no known protocol.
+        services = row.service or [{}]
+        self.service_count = len(services)
+        ports = {}  # { protocol: set of ports, or None for every port }
+        for svc in services:
+            protocol = svc.get('protocol')
+            if protocol not in IP_PROTO:
+                ports = None
+                break
+            port = svc.get('port') if protocol in L4_DST_FIELD else None
+            if port is None:
+                ports[protocol] = None
+            elif ports.get(protocol, ()) is not None:
+                ports.setdefault(protocol, set()).add(port)
+
+        templates = []
+        key_parts = []
+        for protocol, protocol_ports in (ports.items() if ports is not None else [(None, None)]):
+            prefix = (ETH_TYPE_IPV4,)
+            template = {}
+            if protocol is not None:
+                template['ip_proto'] = IP_PROTO[protocol]
+                prefix += (('ip_proto', IP_PROTO[protocol]),)
+            if protocol_ports is None:
+                templates.append(template)
+                key_parts.append((prefix, ()))
+                continue
+            field = L4_DST_FIELD[protocol]
+            for value in port_matches(protocol_ports, ZT_PORT_MASKS):
+                templates.append(dict(template, **{field: value}))
+                key_parts.append((prefix, ((field, value),)))
+        self.l4_templates = tuple(templates)
+        self._key_parts = tuple(key_parts)
+
+    def row_keys(self, src_ip, dst_ip):
+        """Return the table-0 flow keys for one (src, dst) row."""
+        ips = _ipv4_items('ipv4_dst', dst_ip) + _ipv4_items('ipv4_src', src_ip)
+        priority = self.priority
+        return [(0, priority, prefix + ips + suffix) for prefix, suffix in self._key_parts]
+
+
+def policy_version(row):
+    """Content fingerprint of a policy row; changes whenever the row does."""
+    return json.dumps([row.name, row.priority, row.source, row.destination,
+                       row.service, row.action, row.status], sort_keys=True, default=str)
+
+
+class PolicyCompiler:
+    """Compiles PolicyDB rows into CompiledPolicy objects, cached by id and version.
+
+    Rows are compiled while their session is still open, so nothing
+    downstream touches (possibly detached) ORM instances.
+    """
+
+    def __init__(self):
+        self._cache = {}  # { policy_id: CompiledPolicy }
+        self.hits = 0
+        self.misses = 0
+
+    def compile(self, row):
+        version = policy_version(row)
+        compiled = self._cache.get(row.id)
+        if compiled is not None and compiled.version == version:
+            self.hits += 1
+            return compiled
+        self.misses += 1
+        compiled = CompiledPolicy(row, version)
+        self._cache[row.id] = compiled
+        return compiled
+
+    def compile_all(self, rows):
+        """Compile rows into { id: CompiledPolicy }; ids no longer present are evicted."""
+        policies = {row.id: self.compile(row) for row in rows}
+        for policy_id in self._cache.keys() - policies.keys():
+            del self._cache[policy_id]
+        return policies
+
+    def forget(self, policy_id):
+        self._cache.pop(policy_id, None)
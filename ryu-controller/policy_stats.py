@@ -0,0 +1,223 @@
+import logging
+import os
+import random
+import time
+from datetime import datetime
+
+from ryu.lib import hub
+from sqlalchemy import text
+
+from flow_state import match_key
+import metrics
+
+
+log = logging.getLogger(__name__)
+
+# Per-policy hit counters. Every ZT_STATS_INTERVAL seconds (0 = off) each
+# switch this controller programs is polled once, at a jittered offset so a
+# large fleet is not asked in one burst. "flow" mode sends one
+# cookie-filtered OFPFlowStatsRequest per switch; "aggregate" sends one
+# OFPAggregateStatsRequest per policy cookie slot, which keeps replies tiny
+# when there are many flows per policy.
+ZT_STATS_INTERVAL = float(os.environ.get("ZT_STATS_INTERVAL", "30"))
+ZT_STATS_MODE = os.environ.get("ZT_STATS_MODE", "flow")
+
+# Deltas are added server-side, so controllers owning different switches
+# can all write to the same row. Rows are only kept for existing policies.
+POLICY_STATS_UPSERT_SQL = text(
+    "INSERT INTO policy_stats (policy_id, packet_count, byte_count, last_hit_at, updated_at) "
+    "SELECT :policy_id, :packets, :bytes, :last_hit_at, :updated_at "
+    "WHERE EXISTS (SELECT 1 FROM policies WHERE id = :policy_id) "
+    "ON CONFLICT (policy_id) DO UPDATE SET "
+    "packet_count = policy_stats.packet_count + EXCLUDED.packet_count, "
+    "byte_count = policy_stats.byte_count + EXCLUDED.byte_count, "
+    "last_hit_at = coalesce(EXCLUDED.last_hit_at, policy_stats.last_hit_at), "
+    "updated_at = EXCLUDED.updated_at"
+)
+
+
+class PolicyStatsCollector:
+    """Polls ZT flow counters and folds them into per-policy totals.
+
+    Flows carry their policy's cookie slot in the upper 32 cookie bits, so
+    a reply is attributed by cookie alone. Switch counters are cumulative,
+    so the last value of each flow (or slot, in aggregate mode) is kept and
+    only the growth since the previous poll is counted. The first poll of
+    a switch after (re)gaining it only sets the baseline, as its earlier
+    hits were counted by whoever owned it. In flow mode a flow that is new
+    or whose counters went down was (re)added and counts in full. In
+    aggregate mode a new slot only sets its baseline, and a total that
+    went down lost flows and counts nothing until it grows again.
+    """
+
+    def __init__(self, app, cookie, cookie_mask, interval=ZT_STATS_INTERVAL, mode=ZT_STATS_MODE):
+        self.app = app
+        self.cookie = cookie            # ZT tag in the low cookie bits
+        self.cookie_mask = cookie_mask  # Selects every ZT flow
+        self.interval = interval
+        self.mode = mode
+        self.requests = {}   # { (dpid, xid): (slot or None, {key: (slot, packets, bytes)}, sent_at) }; xids are per switch
+        self.last = {}       # { dpid: { flow key or slot: (packets, bytes) } }
+        self.totals = {}     # { policy_id: [packets, bytes, last_hit_at] }
+        self.unsaved = {}    # { policy_id: [packets, bytes, last_hit_at] } not yet in the DB
+
+        # Counters
+        self.polls = 0
+        self.replies = 0
+        self.flush_errors = 0
+
+    def start(self):
+        if self.interval > 0:
+            hub.spawn(self._loop)
+
+    def _loop(self):
+        hub.sleep(random.uniform(0, self.interval))
+        while True:
+            try:
+                dpids = [dpid for dpid in list(self.app.datapaths)
+                         if self.app.is_master_for(dpid) and dpid in self.app.synced_datapaths]
+                self._expire()
+                if not dpids:
+                    hub.sleep(self.interval)
+                # Spread the round over the interval, each gap jittered
+                gap = self.interval / max(len(dpids), 1)
+                for dpid in dpids:
+                    datapath = self.app.datapaths.get(dpid)
+                    if datapath is not None and self.app.is_master_for(dpid):
+                        self.request(datapath)
+                    hub.sleep(gap * random.uniform(0.5, 1.5))
+                self.flush()
+            except Exception as e:
+                log.error(f"Policy stats loop error: {e}")
+                hub.sleep(self.interval)
+
+    def _expire(self):
+        """Forget requests a switch never answered and switches we no longer own."""
+        cutoff = time.time() - 2 * self.interval
+        for request_key, request in list(self.requests.items()):
+            if request[2] < cutoff:
+                del self.requests[request_key]
+        for dpid in list(self.last):
+            if dpid not in self.app.datapaths or not self.app.is_master_for(dpid):
+                del self.last[dpid]
+
+    def request(self, datapath):
+        ofp = datapath.ofproto
+        ofp_parser = datapath.ofproto_parser
+        self.polls += 1
+        if self.mode == "aggregate":
+            for slot in {policy.cookie for policy in self.app.policy_map.values()}:
+                req = ofp_parser.OFPAggregateStatsRequest(
+                    datapath, 0, ofp.OFPTT_ALL, ofp.OFPP_ANY, ofp.OFPG_ANY,
+                    (slot << 32) | self.cookie, 0xFFFFFFFFFFFFFFFF, ofp_parser.OFPMatch())
+                self._send(datapath, req, slot)
+        else:
+            req = ofp_parser.OFPFlowStatsRequest(
+                datapath, 0, ofp.OFPTT_ALL, ofp.OFPP_ANY, ofp.OFPG_ANY,
+                self.cookie, self.cookie_mask, ofp_parser.OFPMatch())
+            self._send(datapath, req, None)
+
+    def _send(self, datapath, req, slot):
+        datapath.set_xid(req)
+        self.requests[(datapath.id, req.xid)] = (slot, {}, time.time())
+        datapath.send_msg(req)
+
+    def owns(self, dpid, xid):
+        return (dpid, xid) in self.requests
+
+    def flow_stats_reply(self, msg):
+        """Fold one part of a flow stats reply; counts once the last part is in."""
+        dpid = msg.datapath.id
+        _, flows, _ = self.requests[(dpid, msg.xid)]
+        for stat in msg.body:
+            key = (stat.table_id, stat.priority, match_key(dict(stat.match.items())))
+            flows[key] = (stat.cookie >> 32, stat.packet_count, stat.byte_count)
+        if msg.flags & msg.datapath.ofproto.OFPMPF_REPLY_MORE:
+            return
+        del self.requests[(dpid, msg.xid)]
+        self.replies += 1
+
+        last = self.last.get(dpid)
+        current = {}
+        deltas = {}
+        for key, (slot, packets, byte_count) in flows.items():
+            current[key] = (packets, byte_count)
+            if last is None:
+                continue
+            previous = last.get(key)
+            if previous is not None and packets >= previous[0] and byte_count >= previous[1]:
+                packets -= previous[0]
+                byte_count -= previous[1]
+            self._add_delta(deltas, slot, packets, byte_count)
+        self.last[dpid] = current
+        self._record(deltas)
+
+    def aggregate_stats_reply(self, msg):
+        dpid = msg.datapath.id
+        slot, _, _ = self.requests.pop((dpid, msg.xid))
+        self.replies += 1
+        body = msg.body
+        deltas = {}
+        last = self.last.setdefault(dpid, {})
+        previous = last.get(slot)
+        if previous is not None:
+            self._add_delta(deltas, slot, max(body.packet_count - previous[0], 0),
+                            max(body.byte_count - previous[1], 0))
+        last[slot] = (body.packet_count, body.byte_count)
+        self._record(deltas)
+
+    @staticmethod
+    def _add_delta(deltas, slot, packets, byte_count):
+        if slot and (packets or byte_count):
+            delta = deltas.setdefault(slot, [0, 0])
+            delta[0] += packets
+            delta[1] += byte_count
+
+    def _record(self, deltas):
+        """Add per-slot deltas to the counters of the policies owning the slots."""
+        if not deltas:
+            return
+        owners = {policy.cookie: policy_id for policy_id, policy in self.app.policy_map.items()}
+        now = time.time()
+        for slot, (packets, byte_count) in deltas.items():
+            policy_id = owners.get(slot)
+            if policy_id is None:
+                continue  # Policy removed since the flows were polled
+            metrics.policy_packets.labels(policy=policy_id).inc(packets)
+            metrics.policy_bytes.labels(policy=policy_id).inc(byte_count)
+            for counts in (self.totals, self.unsaved):
+                entry = counts.setdefault(policy_id, [0, 0, None])
+                entry[0] += packets
+                entry[1] += byte_count
+                if packets:
+                    entry[2] = now
+
+    def flush(self):
+        """Write the deltas gathered since the last flush to policy_stats.
+
+        On failure they are kept and merged into the next flush.
+        """
+        if not self.unsaved:
+            return
+        unsaved, self.unsaved = self.unsaved, {}
+        updated_at = datetime.utcnow()
+        session = self.app.DBSession()
+        try:
+            for policy_id, (packets, byte_count, last_hit) in unsaved.items():
+                session.execute(POLICY_STATS_UPSERT_SQL, {
+                    'policy_id': policy_id, 'packets': packets, 'bytes': byte_count,
+                    'last_hit_at': datetime.utcfromtimestamp(last_hit) if last_hit else None,
+                    'updated_at': updated_at,
+                })
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            self.flush_errors += 1
+            log.error(f"Failed to save policy stats for {len(unsaved)} policies: {e}")
+            for policy_id, (packets, byte_count, last_hit) in unsaved.items():
+                entry = self.unsaved.setdefault(policy_id, [0, 0, None])
+                entry[0] += packets
+                entry[1] += byte_count
+                entry[2] = max(filter(None, (entry[2], last_hit)), default=None)
+        finally:
+            session.close()
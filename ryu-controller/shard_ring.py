@@ -0,0 +1,34 @@
+import bisect
+import hashlib
+
+
+class HashRing:
+    """Consistent hash ring mapping datapath ids to controller member ids.
+
+    Each member is placed on the ring at `vnodes` points so datapaths spread
+    evenly, and adding or removing a member only moves the datapaths in the
+    arcs it gains or loses (about 1/N of them) instead of reshuffling all.
+    """
+
+    def __init__(self, members=(), vnodes=64):
+        self.members = tuple(sorted(members))
+        self._points = []   # sorted ring positions
+        self._owners = []   # member id at the same index
+        ring = sorted((self._hash(f"{member}#{i}"), member)
+                      for member in self.members for i in range(vnodes))
+        for point, member in ring:
+            self._points.append(point)
+            self._owners.append(member)
+
+    @staticmethod
+    def _hash(value):
+        # Stable across processes (unlike hash()), so every controller
+        # computes the same ring from the same membership.
+        return int.from_bytes(hashlib.md5(str(value).encode()).digest()[:8], 'big')
+
+    def owner(self, dpid):
+        """Return the member id that owns dpid, or None if the ring is empty."""
+        if not self._points:
+            return None
+        i = bisect.bisect(self._points, self._hash(dpid)) % len(self._points)
+        return self._owners[i]
@@ -0,0 +1,37 @@
+# Controller tests run against the real Ryu OpenFlow 1.3 parser with
+# ZooKeeper, Kubernetes and PostgreSQL stubbed out the same way the offline
+# reconcile benchmark does (validation/reconcile_bench.py). They need the
+# controller's Python dependencies and pytest, e.g. inside the controller
+# image:
+#
+#     docker compose run --rm -v ./validation:/validation ryu-controller \
+#         sh -c "pip install --user pytest && python -m pytest -q tests"
+import os
+import sys
+
+import pytest
+
+
+CONTROLLER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+VALIDATION_DIR = os.path.join(CONTROLLER_DIR, '..', 'validation')
+
+sys.path.insert(0, os.path.abspath(CONTROLLER_DIR))
+sys.path.insert(0, os.path.abspath(VALIDATION_DIR))
+
+import reconcile_bench  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def zt():
+    return reconcile_bench.load_controller(CONTROLLER_DIR)
+
+
+@pytest.fixture
+def datapath(zt):
+    """Factory for switches that record the FlowMods they receive."""
+    from ryu.ofproto import ofproto_v1_3_parser
+
+    def make(dpid=1):
+        return reconcile_bench.FakeDatapath(dpid, zt.ofproto_v1_3, ofproto_v1_3_parser)
+    return make
+
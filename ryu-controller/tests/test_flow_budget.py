@@ -0,0 +1,57 @@
+"""Flow budget: pipeline policies are trimmed whole and every ZT flow counts."""
+import types
+
+import pytest
+
+
+def policy_row(i, priority):
+    return types.SimpleNamespace(id=f"p{i}", name=f"p{i}", priority=priority,
+                                 source={'ip_block': f"10.0.{i}.1/32"},
+                                 destination={'ip_block': f"10.1.{i}.1/32"},
+                                 service=[], action='DENY', status='ENABLED')
+
+
+@pytest.fixture
+def budgeted(zt, datapath, monkeypatch):
+    monkeypatch.setattr(zt, 'ZT_PIPELINE', 'multitable')
+    monkeypatch.setattr(zt, 'ZT_BUDGET_STRATEGY', 'priority')
+    monkeypatch.setattr(zt, 'ZT_FLOW_BUDGET', 50)
+    app = zt.ZeroTrustController()
+    app.is_master = True
+    dp = datapath(1)
+    app.switch_features_handler(types.SimpleNamespace(msg=types.SimpleNamespace(datapath=dp)))
+    msg = types.SimpleNamespace(datapath=dp, xid=app.readbacks[1][0], body=[], flags=0)
+    app.flow_stats_reply_handler(types.SimpleNamespace(msg=msg))
+    # 30 policies x (src classifier, dst classifier, enforce) + 2 table defaults
+    app.policy_map = app.policy_compiler.compile_all([policy_row(i, 1000 + i) for i in range(30)])
+    app.reconcile_all_flows()
+    return app, dp
+
+
+def test_budget_counts_pipeline_flows(budgeted):
+    app, dp = budgeted
+    installed = app.installed_flows[1]
+    assert len(installed) == 50
+    assert {key[0] for key in installed} == {0, 1, 2}
+    assert len(app.budget_excluded[1]) == 2 + 30 * 3 - 50
+
+
+def test_budget_trims_pipeline_policy_with_its_classifiers(budgeted):
+    app, dp = budgeted
+    installed = app.installed_flows[1]
+    kept = {policy_id for policy_id, unit in app.pipeline_units.items()
+            if {key for _, key in unit} <= set(installed)}
+    # The 16 highest-priority policies fit whole; nothing else is installed
+    assert kept == {f"p{i}" for i in range(14, 30)}
+    for policy_id, unit in app.pipeline_units.items():
+        if policy_id not in kept:
+            assert not {key for _, key in unit} & set(installed)
+
+
+def test_disconnect_forgets_learned_capacity(zt, budgeted):
+    app, dp = budgeted
+    app.flow_capacity[1] = 20
+    app.table_full.add(1)
+    app.switch_disconnect_handler(types.SimpleNamespace(datapath=dp))
+    assert 1 not in app.flow_capacity
+    assert 1 not in app.table_full
@@ -0,0 +1,159 @@
+"""PodInformer against a recorded API server: sync, bookmark resume, 410 relist."""
+import json
+import types
+
+import pytest
+from kubernetes.client import V1ListMeta, V1ObjectMeta, V1Pod, V1PodList, V1PodSpec, V1PodStatus
+
+import k8s_watcher
+
+
+class Stop(BaseException):
+    """Ends PodInformer.run(), which retries every Exception."""
+
+
+def pod_json(name, ip, labels, rv, node='node-1'):
+    return {'kind': 'Pod', 'apiVersion': 'v1',
+            'metadata': {'name': name, 'namespace': 'default', 'labels': labels,
+                         'resourceVersion': str(rv)},
+            'spec': {'containers': [], 'nodeName': node},
+            'status': {'podIP': ip}}
+
+
+def pod_list(rv, *pods):
+    return V1PodList(metadata=V1ListMeta(resource_version=str(rv)), items=[
+        V1Pod(metadata=V1ObjectMeta(name=p['metadata']['name'], namespace='default',
+                                    labels=p['metadata']['labels'],
+                                    resource_version=p['metadata']['resourceVersion']),
+              spec=V1PodSpec(containers=[], node_name=p['spec']['nodeName']),
+              status=V1PodStatus(pod_ip=p['status']['podIP']))
+        for p in pods])
+
+
+def event(event_type, obj):
+    return json.dumps({'type': event_type, 'object': obj})
+
+
+def bookmark(rv):
+    return event('BOOKMARK', {'kind': 'Pod', 'apiVersion': 'v1',
+                              'metadata': {'resourceVersion': str(rv)}})
+
+
+def expired(rv):
+    return event('ERROR', {'kind': 'Status', 'apiVersion': 'v1', 'status': 'Failure',
+                           'message': f"too old resource version: {rv}", 'reason': 'Expired',
+                           'code': 410})
+
+
+class RecordedStream:
+    """The urllib3 response kubernetes.watch.Watch reads a watch from."""
+
+    status = 200
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def stream(self, amt=None, decode_content=False):
+        for line in self.lines:
+            yield (line + '\n').encode()
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class RecordedCoreV1:
+    """Replays list responses and watch streams, recording each call."""
+
+    def __init__(self, lists, watches):
+        self.lists = list(lists)
+        self.watches = list(watches)
+        self.calls = []
+
+    def list_pod_for_all_namespaces(self, **kwargs):
+        """Fake CoreV1Api.list_pod_for_all_namespaces.
+
+        :rtype: V1PodList
+        """
+        if not kwargs.get('watch'):
+            self.calls.append(('list', None))
+            return self.lists.pop(0)
+        self.calls.append(('watch', kwargs['resource_version']))
+        if not self.watches:
+            raise Stop()
+        return RecordedStream(self.watches.pop(0))
+
+
+A = pod_json('a', '10.0.0.1', {'app': 'web'}, 5)
+B = pod_json('b', '10.0.0.2', {'app': 'db'}, 6)
+
+
+@pytest.fixture
+def informer():
+    def make(api):
+        emitted, synced = [], []
+        informer = k8s_watcher.PodInformer(api, None, 'zt=1',
+                                           lambda *ev: emitted.append(ev[:2]),
+                                           lambda: synced.append(len(emitted)))
+        with pytest.raises(Stop):
+            informer.run()
+        return informer, emitted, synced
+    return make
+
+
+def test_synced_after_first_list_only(informer):
+    api = RecordedCoreV1([pod_list(10, A, B)], [])
+    informer, emitted, synced = informer(api)
+    assert informer.synced
+    # Called once, after every listed Pod was emitted
+    assert synced == [2]
+    assert emitted == [('ADDED', '10.0.0.1'), ('ADDED', '10.0.0.2')]
+
+
+def test_watch_resumes_from_bookmark_without_relisting(informer):
+    api = RecordedCoreV1([pod_list(10, A, B)], [
+        [event('MODIFIED', pod_json('a', '10.0.0.1', {'app': 'web2'}, 11)), bookmark(20)],
+        # Server timeout: the stream just ends
+        [],
+        [event('DELETED', pod_json('b', '10.0.0.2', {'app': 'db'}, 21))],
+    ])
+    informer, emitted, synced = informer(api)
+    assert api.calls == [('list', None), ('watch', '10'), ('watch', '20'), ('watch', '20'),
+                         ('watch', '21')]
+    assert informer.relists == 1
+    assert emitted[2:] == [('MODIFIED', '10.0.0.1'), ('DELETED', '10.0.0.2')]
+
+
+def test_expired_watch_relists_and_diffs(informer):
+    c = pod_json('c', '10.0.0.3', {'app': 'cache'}, 31)
+    api = RecordedCoreV1([pod_list(10, A, B), pod_list(40, A, c)], [
+        [bookmark(15), expired(15)],
+        [],
+    ])
+    informer, emitted, synced = informer(api)
+    assert api.calls == [('list', None), ('watch', '10'), ('list', None), ('watch', '40'),
+                         ('watch', '40')]
+    assert informer.relists == 2
+    assert synced == [2]
+    # Only the differences: a is unchanged, b is gone and c is new
+    assert emitted[2:] == [('DELETED', '10.0.0.2'), ('ADDED', '10.0.0.3')]
+    assert set(informer.pods) == {'default/a', 'default/c'}
+
+
+def test_watcher_reports_synced_once_every_informer_listed(monkeypatch):
+    sent = []
+    app = types.SimpleNamespace(send_event_to_observers=sent.append)
+    monkeypatch.setattr(k8s_watcher, 'K8S_NAMESPACES', ['blue', 'green'])
+    monkeypatch.setattr(k8s_watcher.hub, 'spawn', lambda *args: None)
+    watcher = k8s_watcher.K8sWatcher(app)
+    watcher.k8s_available = True
+    watcher.start()
+
+    watcher.informers[0].synced = True
+    watcher._informer_synced()
+    assert not sent
+    watcher.informers[1].synced = True
+    watcher._informer_synced()
+    assert [type(ev) for ev in sent] == [k8s_watcher.EventK8sPodsSynced]
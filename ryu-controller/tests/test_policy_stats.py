@@ -0,0 +1,35 @@
+"""Policy stats requests share flow stats replies with read-backs."""
+import types
+
+
+def connect(app, dp):
+    app.switch_features_handler(types.SimpleNamespace(msg=types.SimpleNamespace(datapath=dp)))
+
+
+def reply(app, dp, xid):
+    msg = types.SimpleNamespace(datapath=dp, xid=xid, body=[], flags=0)
+    app.flow_stats_reply_handler(types.SimpleNamespace(msg=msg))
+
+
+def test_stats_request_does_not_take_another_switchs_readback(zt, datapath):
+    app = zt.ZeroTrustController()
+    app.is_master = True
+    dp1, dp2 = datapath(1), datapath(2)
+    connect(app, dp1)
+    reply(app, dp1, app.readbacks[1][0])
+    connect(app, dp2)
+    readback_xid = app.readbacks[2][0]
+
+    # Each switch numbers its own xids: switch 1's stats request reuses it
+    dp1.xid = readback_xid - 1
+    app.policy_stats.request(dp1)
+    assert app.policy_stats.owns(1, readback_xid)
+
+    reply(app, dp2, readback_xid)
+    assert 2 in app.synced_datapaths
+    assert 2 not in app.readbacks
+    assert app.policy_stats.owns(1, readback_xid)
+
+    reply(app, dp1, readback_xid)
+    assert not app.policy_stats.requests
+    assert app.policy_stats.replies == 1
@@ -0,0 +1,101 @@
+"""Cold takeover: flows read back before the first full reconcile are kept."""
+import types
+
+from ryu.ofproto import ofproto_v1_3_parser
+
+
+def policy_row(policy_id, priority, src, dst, service=None):
+    return types.SimpleNamespace(id=policy_id, name=policy_id, priority=priority,
+                                 source={'ip_block': src}, destination={'ip_block': dst},
+                                 service=service or [], action='DENY', status='ENABLED')
+
+
+POLICIES = [
+    policy_row('deny-db', 5000, '10.0.0.0/24', '10.0.1.5/32', [{'protocol': 'TCP', 'port': 5432}]),
+    policy_row('quarantine', 65000, '10.0.0.7/32', '0.0.0.0/0'),
+]
+
+
+def connect(app, dp):
+    app.switch_features_handler(types.SimpleNamespace(msg=types.SimpleNamespace(datapath=dp)))
+
+
+def answer_readback(app, dp, flows):
+    """Reply to the pending read-back with the given {key: (instructions, slot)}."""
+    body = []
+    for (table_id, priority, fields), (instructions, slot) in flows.items():
+        body.append(ofproto_v1_3_parser.OFPFlowStats(
+            table_id=table_id, priority=priority, cookie=(slot << 32) | 0xDEADBEEF,
+            match=ofproto_v1_3_parser.OFPMatch(**dict(fields)),
+            instructions=app.build_instructions(dp, instructions)))
+    msg = types.SimpleNamespace(datapath=dp, xid=app.readbacks[dp.id][0], body=body, flags=0)
+    app.flow_stats_reply_handler(types.SimpleNamespace(msg=msg))
+
+
+def programmed_flows(zt, datapath):
+    """ZT flows the previous master left on switch 1."""
+    previous = zt.ZeroTrustController()
+    previous.is_master = True
+    dp = datapath(1)
+    connect(previous, dp)
+    answer_readback(previous, dp, {})
+    previous.policy_map = previous.policy_compiler.compile_all(POLICIES)
+    previous.reconcile_all_flows()
+    assert previous.installed_flows[1]
+    return dict(previous.installed_flows[1])
+
+
+def cold_standby(zt, datapath, monkeypatch):
+    monkeypatch.setattr(zt, 'ZT_WARM_STANDBY', False)
+    app = zt.ZeroTrustController()
+    app.pods_synced = True
+    dp = datapath(1)
+    connect(app, dp)
+
+    def load_policies_from_db():
+        app.policy_map = app.policy_compiler.compile_all(POLICIES)
+        app.policy_state_loaded = True
+    monkeypatch.setattr(app, 'load_policies_from_db', load_policies_from_db)
+    return app, dp
+
+
+def test_cold_takeover_keeps_flows_read_back_before_full_reconcile(zt, datapath, monkeypatch):
+    installed = programmed_flows(zt, datapath)
+    app, dp = cold_standby(zt, datapath, monkeypatch)
+
+    app.set_master_role(True)
+    # The read-back completes before the urgent full reconcile runs
+    answer_readback(app, dp, installed)
+    assert dp.counters()[:2] == (0, 0)
+    assert app.installed_flows[1] == installed
+
+    app.reconcile_scheduler.run()
+    assert dp.counters()[:2] == (0, 0)
+    assert app.installed_flows[1] == installed
+
+
+def test_cold_takeover_removes_stale_flows_after_full_reconcile(zt, datapath, monkeypatch):
+    installed = programmed_flows(zt, datapath)
+    stale_key = (0, 4000, (('eth_type', 0x0800), ('ipv4_src', '10.9.9.9')))
+    app, dp = cold_standby(zt, datapath, monkeypatch)
+
+    app.set_master_role(True)
+    answer_readback(app, dp, {**installed, stale_key: ((), 0)})
+    assert dp.counters()[:2] == (0, 0)
+
+    app.reconcile_scheduler.run()
+    assert dp.counters()[:2] == (0, 1)
+    assert app.installed_flows[1] == installed
+
+
+def test_readback_timeout_before_full_reconcile_defers_purge(zt, datapath, monkeypatch):
+    installed = programmed_flows(zt, datapath)
+    app, dp = cold_standby(zt, datapath, monkeypatch)
+
+    app.set_master_role(True)
+    app.readback_timeout_handler(zt.EventReadbackTimeout(1, app.readbacks[1][0]))
+    assert dp.counters()[:2] == (0, 0)
+
+    app.reconcile_scheduler.run()
+    assert dp.counters()[:2] == (len(installed), 1)
+    assert app.installed_flows[1] == installed
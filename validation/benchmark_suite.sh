@@ -142,11 +142,12 @@ echo "1. Identify MASTER controller:"
 echo "   docker compose logs ryu-controller | grep MASTER"
 echo "   docker compose logs ryu-controller-2 | grep MASTER"
 echo
-echo "2. Kill MASTER:"
-echo "   docker compose stop ryu-controller  (or ryu-controller-2)"
+echo "2. Kill MASTER (SIGKILL, so its ZK session has to time out):"
+echo "   docker compose kill ryu-controller  (or ryu-controller-2)"
 echo
-echo "3. Verify SLAVE becomes MASTER:"
-echo "   docker compose logs ryu-controller-2 --follow"
+echo "3. Verify SLAVE becomes MASTER and measure failover-to-first-FlowMod:"
+echo "   docker compose logs ryu-controller-2 --follow | grep -E 'MASTER|after takeover'"
+echo "   (detection is bounded by ZK_SESSION_TIMEOUT)"
 echo
 echo "4. Test connectivity in Mininet (should resume within 1s)"
 echo
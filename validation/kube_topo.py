@@ -1,15 +1,51 @@
+import argparse
+
 from mininet.net import Mininet
 from mininet.node import RemoteController, OVSKernelSwitch
 from mininet.cli import CLI
 from mininet.log import setLogLevel
 
 
-def create_k8s_topology():
+# Leaf (node) switches keep dpid = node number so ZT_NODE_DATAPATHS can use
+# "node-1=1,node-2=2,..."; spines are numbered from SPINE_DPID_BASE.
+# Pod IPs are 10.0.<node>.<pod>, which bounds both counts; MAX_NODES also
+# keeps leaf dpids below the spines'.
+SPINE_DPID_BASE = 0x100
+MAX_NODES = 255
+MAX_PODS_PER_NODE = 254
+LAYOUTS = ('linear', 'leaf-spine', 'ring')
+
+
+def pod_ip(node, pod):
+    """IP of pod `pod` (1-based) on node `node` (1-based): 10.0.<node>.<pod>."""
+    return f"10.0.{node}.{pod}"
+
+
+def host_name(node, pod, pods_per_node):
+    """Mininet host name; hosts are numbered node by node (h1, h2 on node 1, ...)."""
+    return f"h{(node - 1) * pods_per_node + pod}"
+
+
+def build_k8s_topology(nodes=2, pods_per_node=2, layout='linear', spines=2,
+                       controllers=(('127.0.0.1', 6653), ('127.0.0.1', 6654))):
     """
-    Creates a simple Mininet topology to emulate K8s nodes.
-    - 2 OVS switches (representing 2 K8s worker nodes) [cite: 302]
-    - 2 hosts per switch (representing Pods) [cite: 303]
+    Builds and starts a Mininet topology emulating a K8s cluster.
+    - One OVS switch per K8s worker node, `pods_per_node` hosts (Pods) each [cite: 302, 303]
+    - Node switches joined in a chain ('linear'), to every spine switch
+      ('leaf-spine'), or in a closed 'ring'. Layouts with loops run STP,
+      so allow it time to converge before measuring.
+    - Every switch connects to all controllers (multi-controller OVS) [cite: 305]
+
+    All Pods share 10.0.0.0/16 so any pair can reach each other over the
+    baseline NORMAL rule. Returns the started Mininet network.
     """
+    if layout not in LAYOUTS:
+        raise ValueError(f"unknown layout {layout!r}; expected one of {LAYOUTS}")
+    if not 1 <= nodes <= MAX_NODES:
+        raise ValueError(f"nodes must be 1..{MAX_NODES}, got {nodes}")
+    if not 1 <= pods_per_node <= MAX_PODS_PER_NODE:
+        raise ValueError(f"pods_per_node must be 1..{MAX_PODS_PER_NODE}, got {pods_per_node}")
+    stp = layout != 'linear'
     net = Mininet(
         controller=None,
         switch=OVSKernelSwitch,
@@ -17,50 +53,49 @@ def create_k8s_topology():
     )
 
     print("Adding remote controllers (pointing to Docker)...")
-    # Point to the Ryu controllers running in Docker [cite: 305]
-    c0 = net.addController(
-        'c0',
-        controller=RemoteController,
-        ip='127.0.0.1',  # Docker host IP
-        port=6653        # First Ryu controller
-    )
-    c1 = net.addController(
-        'c1',
-        controller=RemoteController,
-        ip='127.0.0.1',
-        port=6654        # Second Ryu controller instance
-    )
+    ctrls = [net.addController(f"c{i}", controller=RemoteController, ip=ip, port=port)
+             for i, (ip, port) in enumerate(controllers)]
 
-    print("Adding switches (K8s Nodes)...")
-    s1 = net.addSwitch('s1')  # Node 1
-    s2 = net.addSwitch('s2')  # Node 2
-
-    print("Adding hosts (Pods)...")
-    # Pods on Node 1
-    h1 = net.addHost('h1', ip='10.0.1.1/24')
-    h2 = net.addHost('h2', ip='10.0.1.2/24')
-    
-    # Pods on Node 2
-    h3 = net.addHost('h3', ip='10.0.2.1/24')
-    h4 = net.addHost('h4', ip='10.0.2.2/24')
-
-    print("Creating links...")
-    # Pods to switches
-    net.addLink(h1, s1)
-    net.addLink(h2, s1)
-    net.addLink(h3, s2)
-    net.addLink(h4, s2)
-    
-    # Switches together
-    net.addLink(s1, s2)
+    print(f"Adding {nodes} node switches ({layout})...")
+    leaves = [net.addSwitch(f"s{n}", dpid=f"{n:016x}", stp=stp) for n in range(1, nodes + 1)]
+    fabric = []
+    if layout == 'leaf-spine':
+        fabric = [net.addSwitch(f"sp{k}", dpid=f"{SPINE_DPID_BASE + k:016x}", stp=stp)
+                  for k in range(1, spines + 1)]
+
+    print(f"Adding {pods_per_node} hosts (Pods) per node...")
+    for n, leaf in enumerate(leaves, start=1):
+        for p in range(1, pods_per_node + 1):
+            host = net.addHost(host_name(n, p, pods_per_node), ip=f"{pod_ip(n, p)}/16")
+            net.addLink(host, leaf)
+
+    print("Creating fabric links...")
+    if layout == 'leaf-spine':
+        for leaf in leaves:
+            for spine in fabric:
+                net.addLink(leaf, spine)
+    else:
+        for a, b in zip(leaves, leaves[1:]):
+            net.addLink(a, b)
+        if layout == 'ring' and nodes > 2:
+            net.addLink(leaves[-1], leaves[0])
 
     print("Starting network...")
     net.build()
-    c0.start()
-    c1.start()
-    # Start switches with both controllers to emulate multi-controller OVS
-    s1.start([c0, c1])
-    s2.start([c0, c1])
+    for ctrl in ctrls:
+        ctrl.start()
+    # Start switches with all controllers to emulate multi-controller OVS
+    for switch in leaves + fabric:
+        switch.start(ctrls)
+    return net
+
+
+def create_k8s_topology(**kwargs):
+    """
+    Builds the topology and drops into the interactive Mininet CLI.
+    Defaults to the original 2 node x 2 Pod setup (h1, h2 on s1; h3, h4 on s2).
+    """
+    net = build_k8s_topology(**kwargs)
 
     print("Network is running. Type 'h1 ping h3' to test.")
     print("Run Test C (Policy Enforcement)[cite: 319]:")
@@ -68,17 +103,52 @@ def create_k8s_topology():
     print("2. In another terminal: curl -X POST http://localhost:8000/api/v1/policies "
           "-H 'Content-Type: application/json' -d '...' (to DENY 10.0.1.1 to 10.0.2.1)")
     print("3. In Mininet: h1 ping h3 (should fail)")
-    
+    print("For timed, non-interactive measurements use validation/topo_bench.py.")
+
     CLI(net)
 
     print("Stopping network...")
     net.stop()
 
 
+def add_topology_args(parser):
+    parser.add_argument('--nodes', type=int, default=2, help="K8s worker nodes (one switch each)")
+    parser.add_argument('--pods-per-node', type=int, default=2)
+    parser.add_argument('--layout', choices=LAYOUTS, default='linear')
+    parser.add_argument('--spines', type=int, default=2, help="spine switches for --layout leaf-spine")
+    parser.add_argument('--controllers', default='127.0.0.1:6653,127.0.0.1:6654',
+                        help="comma-separated host:port list")
+
+
+def check_topology_args(parser, args):
+    if not 1 <= args.nodes <= MAX_NODES:
+        parser.error(f"--nodes must be 1..{MAX_NODES} (Pod IPs are 10.0.<node>.<pod>)")
+    if not 1 <= args.pods_per_node <= MAX_PODS_PER_NODE:
+        parser.error(f"--pods-per-node must be 1..{MAX_PODS_PER_NODE} (Pod IPs are 10.0.<node>.<pod>)")
+    if args.layout == 'leaf-spine' and args.spines < 1:
+        parser.error("--spines must be at least 1 for --layout leaf-spine")
+
+
+def topology_kwargs(args):
+    controllers = []
+    for item in args.controllers.split(','):
+        host, _, port = item.strip().rpartition(':')
+        controllers.append((host, int(port)))
+    return {
+        'nodes': args.nodes,
+        'pods_per_node': args.pods_per_node,
+        'layout': args.layout,
+        'spines': args.spines,
+        'controllers': controllers,
+    }
+
+
 if __name__ == '__main__':
     # [cite_start]This Mininet script emulates the K8s node topology [cite: 301]
     # and connects to our remote Ryu controller cluster.
+    parser = argparse.ArgumentParser(description="Emulated K8s topology with an interactive Mininet CLI")
+    add_topology_args(parser)
+    args = parser.parse_args()
+    check_topology_args(parser, args)
     setLogLevel('info')
-    create_k8s_topology()
-
-
+    create_k8s_topology(**topology_kwargs(args))
@@ -0,0 +1,575 @@
+"""
+OpenFlow 1.3 switch emulator for controller scale testing.
+
+Opens one TCP session per emulated switch to each controller, completes the
+hello/features/port-desc handshake, answers echo, role, barrier and
+flow-stats requests, and keeps a per-switch flow table built from the
+FlowMods it receives. Every FlowMod is recorded with a timestamp. No root,
+OVS or Mininet needed, and nothing beyond the standard library.
+
+Measures:
+  - connect storm: per-switch time to handshake, MASTER role and the first
+    answered barrier (the baseline flow is installed), with all switches
+    connecting at once or at --connect-rate per second
+  - propagation (--api): a probe DENY policy is created through the policy
+    API; reported is how long each switch takes to receive its FlowMods and
+    the barrier that commits them, then the same for its deletion
+  - failover (--duration): stop the MASTER controller while this runs; every
+    MASTER role change is timed from the moment the old MASTER's session
+    closed (or it was demoted) and the FlowMods the new MASTER sends after
+    taking over are counted
+
+Example, against the docker-compose controllers:
+
+    python validation/of_switch_emulator.py --switches 200 \\
+        --controllers 127.0.0.1:6653,127.0.0.1:6654 --api http://127.0.0.1:8000 \\
+        --duration 60 --output of_emulator.json
+
+Simplifications: non-strict deletes and flow-stats filters only understand
+the empty (match-all) match or an exact match, out_port/out_group filters
+are ignored, and ONF bundles are rejected so the controller falls back to
+plain FlowMods.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import struct
+import sys
+import time
+import urllib.request
+
+
+log = logging.getLogger("of_switch_emulator")
+
+OFP_VERSION = 0x04
+OFP_HEADER = struct.Struct('!BBHI')  # version, type, length, xid
+OFP_MAX_MSG_LEN = 0xFFFF
+
+OFPT_HELLO = 0
+OFPT_ERROR = 1
+OFPT_ECHO_REQUEST = 2
+OFPT_ECHO_REPLY = 3
+OFPT_EXPERIMENTER = 4
+OFPT_FEATURES_REQUEST = 5
+OFPT_FEATURES_REPLY = 6
+OFPT_GET_CONFIG_REQUEST = 7
+OFPT_GET_CONFIG_REPLY = 8
+OFPT_FLOW_MOD = 14
+OFPT_MULTIPART_REQUEST = 18
+OFPT_MULTIPART_REPLY = 19
+OFPT_BARRIER_REQUEST = 20
+OFPT_BARRIER_REPLY = 21
+OFPT_ROLE_REQUEST = 24
+OFPT_ROLE_REPLY = 25
+OFPT_GET_ASYNC_REQUEST = 26
+OFPT_GET_ASYNC_REPLY = 27
+
+OFPMP_DESC = 0
+OFPMP_FLOW = 1
+OFPMP_PORT_DESC = 13
+OFPMPF_REPLY_MORE = 1
+
+OFPFC_ADD = 0
+OFPFC_MODIFY = 1
+OFPFC_MODIFY_STRICT = 2
+OFPFC_DELETE = 3
+OFPFC_DELETE_STRICT = 4
+OFPFC_NAMES = {0: 'add', 1: 'modify', 2: 'modify_strict', 3: 'delete', 4: 'delete_strict'}
+OFPTT_ALL = 0xFF
+
+OFPCR_ROLE_NOCHANGE = 0
+OFPCR_ROLE_EQUAL = 1
+OFPCR_ROLE_MASTER = 2
+OFPCR_ROLE_SLAVE = 3
+
+OFPET_BAD_REQUEST = 1
+OFPBRC_BAD_EXPERIMENTER = 3
+OFPBRC_IS_SLAVE = 10
+OFPET_FLOW_MOD_FAILED = 5
+OFPFMFC_TABLE_FULL = 1
+OFPET_ROLE_REQUEST_FAILED = 11
+OFPRRFC_STALE = 0
+
+OFPP_LOCAL = 0xFFFFFFFE
+
+FEATURES_REPLY = struct.Struct('!QIBB2xII')      # datapath_id, n_buffers, n_tables, auxiliary_id, capabilities, reserved
+ROLE = struct.Struct('!I4xQ')                     # role, generation_id
+MULTIPART = struct.Struct('!HH4x')                # type, flags
+FLOW_MOD = struct.Struct('!QQBBHHHIIIH2x')        # cookie, cookie_mask, table_id, command, idle, hard, priority, buffer_id, out_port, out_group, flags
+FLOW_STATS_REQUEST = struct.Struct('!B3xII4xQQ')  # table_id, out_port, out_group, cookie, cookie_mask
+FLOW_STATS = struct.Struct('!HBxIIHHHH4xQQQ')     # length, table_id, duration_sec/nsec, priority, idle, hard, flags, cookie, packets, bytes
+PORT = struct.Struct('!I4x6s2x16sIIIIIIII')       # port_no, hw_addr, name, config, state, curr, advertised, supported, peer, curr/max speed
+DESC = struct.Struct('!256s256s256s32s256s')
+EMPTY_MATCH = b'\x00\x01\x00\x04\x00\x00\x00\x00'  # OFPMT_OXM with no fields
+
+
+def match_span(buf, offset):
+    """Return the padded length of the ofp_match starting at offset."""
+    length = struct.unpack_from('!H', buf, offset + 2)[0]
+    return (length + 7) // 8 * 8
+
+
+def distribution(values, scale=1, unit=''):
+    """Mean and nearest-rank percentiles of values (multiplied by scale)."""
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))] * scale, 3)
+
+    return {
+        'count': len(ordered),
+        f"mean{unit}": round(sum(ordered) / len(ordered) * scale, 3),
+        f"p50{unit}": pct(50),
+        f"p95{unit}": pct(95),
+        f"p99{unit}": pct(99),
+        f"max{unit}": round(ordered[-1] * scale, 3),
+    }
+
+
+def summarize(samples):
+    """Latency percentiles in milliseconds."""
+    return distribution(samples, 1000, '_ms')
+
+
+class Flow:
+    __slots__ = ('cookie', 'instructions', 'installed_at')
+
+    def __init__(self, cookie, instructions, installed_at):
+        self.cookie = cookie
+        self.instructions = instructions
+        self.installed_at = installed_at
+
+
+class EmulatedSwitch:
+    """One datapath: a flow table shared by its sessions to every controller."""
+
+    def __init__(self, emulator, dpid):
+        self.emulator = emulator
+        self.dpid = dpid
+        self.flows = {}  # { (table_id, priority, match bytes): Flow }
+        self.sessions = []
+        self.generation_id = None  # Highest role generation seen (OF1.3 6.3.5)
+        self.master = None         # Session holding the MASTER role
+        self.master_lost_at = None
+        self.lost_from = None      # Controller of the MASTER session that went away
+        self.connect_started = None
+        self.handshake_at = None
+        self.master_at = None
+        self.baseline_at = None
+        self.failovers = []  # [{'from', 'to', 'gap', 'flowmods'}]
+
+    def set_role(self, session, role, generation_id):
+        """Apply a role request; returns an error (type, code) or None."""
+        if role in (OFPCR_ROLE_MASTER, OFPCR_ROLE_SLAVE):
+            if self.generation_id is not None and ((generation_id - self.generation_id) & (1 << 63)):
+                return OFPET_ROLE_REQUEST_FAILED, OFPRRFC_STALE
+            self.generation_id = generation_id
+        if role == OFPCR_ROLE_NOCHANGE:
+            return None
+        if role == OFPCR_ROLE_MASTER:
+            previous = self.master
+            if previous is not None and previous is not session:
+                previous.role = OFPCR_ROLE_SLAVE
+                self.lost_master(previous)
+            session.role = role
+            self.master = session
+            if previous is not session:
+                self.took_master(session)
+        else:
+            session.role = role
+            if self.master is session:
+                self.lost_master(session)
+        return None
+
+    def lost_master(self, session):
+        self.master = None
+        self.master_lost_at = time.monotonic()
+        self.lost_from = session.controller
+
+    def took_master(self, session):
+        now = time.monotonic()
+        if self.master_at is None:
+            self.master_at = now
+            return
+        gap = now - self.master_lost_at if self.master_lost_at is not None else 0.0
+        self.failovers.append({'from': self.lost_from, 'to': session.controller, 'gap': gap, 'flowmods': 0})
+        self.master_lost_at = None
+        log.info(f"Switch {self.dpid:#x}: MASTER moved to {session.controller} after {gap * 1000:.1f} ms")
+
+    def session_closed(self, session):
+        if session in self.sessions:
+            self.sessions.remove(session)
+        if self.master is session:
+            self.lost_master(session)
+
+    def flow_mod(self, session, buf):
+        """Apply a FlowMod; returns an error (type, code) or None."""
+        (cookie, cookie_mask, table_id, command, _, _, priority,
+         _, _, _, _) = FLOW_MOD.unpack_from(buf, 8)
+        offset = 8 + FLOW_MOD.size
+        span = match_span(buf, offset)
+        match = bytes(buf[offset:offset + span])
+        instructions = bytes(buf[offset + span:])
+        now = time.monotonic()
+        self.emulator.record_flow_mod(self, session, command, table_id, priority, cookie, now)
+        if self.failovers and session is self.master and self.failovers[-1]['to'] == session.controller:
+            self.failovers[-1]['flowmods'] += 1
+
+        key = (table_id, priority, match)
+        if command == OFPFC_ADD:
+            limit = self.emulator.table_size
+            if key not in self.flows and limit and len(self.flows) >= limit:
+                return OFPET_FLOW_MOD_FAILED, OFPFMFC_TABLE_FULL
+            self.flows[key] = Flow(cookie, instructions, now)
+        elif command == OFPFC_MODIFY_STRICT:
+            flow = self.flows.get(key)
+            if flow is not None and (flow.cookie & cookie_mask) == (cookie & cookie_mask):
+                flow.instructions = instructions
+        elif command == OFPFC_MODIFY:
+            for flow_key in self.select(table_id, cookie, cookie_mask, match):
+                self.flows[flow_key].instructions = instructions
+        elif command == OFPFC_DELETE_STRICT:
+            flow = self.flows.get(key)
+            if flow is not None and (flow.cookie & cookie_mask) == (cookie & cookie_mask):
+                del self.flows[key]
+        elif command == OFPFC_DELETE:
+            for flow_key in self.select(table_id, cookie, cookie_mask, match):
+                del self.flows[flow_key]
+        return None
+
+    def select(self, table_id, cookie, cookie_mask, match):
+        """Keys of flows a non-strict request applies to."""
+        return [key for key, flow in self.flows.items()
+                if (table_id == OFPTT_ALL or key[0] == table_id)
+                and (flow.cookie & cookie_mask) == (cookie & cookie_mask)
+                and (match == EMPTY_MATCH or key[2] == match)]
+
+    def flow_stats(self, body):
+        table_id, _, _, cookie, cookie_mask = FLOW_STATS_REQUEST.unpack_from(body, 0)
+        offset = FLOW_STATS_REQUEST.size
+        match = bytes(body[offset:offset + match_span(body, offset)])
+        now = time.monotonic()
+        entries = []
+        for key in self.select(table_id, cookie, cookie_mask, match):
+            flow = self.flows[key]
+            age = now - flow.installed_at
+            length = FLOW_STATS.size + len(key[2]) + len(flow.instructions)
+            entries.append(FLOW_STATS.pack(length, key[0], int(age), int(age % 1 * 1e9), key[1],
+                                           0, 0, 0, flow.cookie, 0, 0) + key[2] + flow.instructions)
+        return entries
+
+    def port_desc(self):
+        name = f"s{self.dpid}".encode()[:15]
+        hw_addr = self.dpid.to_bytes(6, 'big')
+        return [PORT.pack(OFPP_LOCAL, hw_addr, name, 0, 0, 0, 0, 0, 0, 0, 0)]
+
+
+class Session:
+    """One switch <-> controller OpenFlow connection."""
+
+    def __init__(self, switch, controller):
+        self.switch = switch
+        self.controller = controller
+        self.role = OFPCR_ROLE_EQUAL
+        self.writer = None
+        self.pending_flowmods = False
+
+    async def run(self):
+        switch = self.switch
+        host, port = self.controller.rsplit(':', 1)
+        while not self.switch.emulator.stopping:
+            try:
+                reader, self.writer = await asyncio.open_connection(host, int(port))
+            except OSError as e:
+                log.debug(f"Switch {switch.dpid:#x}: connect to {self.controller} failed: {e}")
+                await asyncio.sleep(self.switch.emulator.reconnect_delay)
+                continue
+            switch.sessions.append(self)
+            self.role = OFPCR_ROLE_EQUAL
+            self.send(OFPT_HELLO, 0, b'')
+            try:
+                while True:
+                    header = await reader.readexactly(OFP_HEADER.size)
+                    _, msg_type, length, xid = OFP_HEADER.unpack(header)
+                    body = await reader.readexactly(length - OFP_HEADER.size)
+                    self.handle(msg_type, xid, header + body)
+                    await self.writer.drain()
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                log.info(f"Switch {switch.dpid:#x}: session to {self.controller} closed ({e.__class__.__name__})")
+            finally:
+                switch.session_closed(self)
+                self.writer.close()
+            await asyncio.sleep(self.switch.emulator.reconnect_delay)
+
+    def send(self, msg_type, xid, body):
+        self.writer.write(OFP_HEADER.pack(OFP_VERSION, msg_type, OFP_HEADER.size + len(body), xid) + body)
+
+    def send_error(self, xid, err_type, code, buf):
+        self.send(OFPT_ERROR, xid, struct.pack('!HH', err_type, code) + bytes(buf[:64]))
+
+    def send_multipart(self, xid, mp_type, entries):
+        """Send a multipart reply, split across messages to fit OFP_MAX_MSG_LEN."""
+        limit = OFP_MAX_MSG_LEN - OFP_HEADER.size - MULTIPART.size
+        chunks = [[]]
+        size = 0
+        for entry in entries:
+            if chunks[-1] and size + len(entry) > limit:
+                chunks.append([])
+                size = 0
+            chunks[-1].append(entry)
+            size += len(entry)
+        for i, chunk in enumerate(chunks):
+            flags = OFPMPF_REPLY_MORE if i < len(chunks) - 1 else 0
+            self.send(OFPT_MULTIPART_REPLY, xid, MULTIPART.pack(mp_type, flags) + b''.join(chunk))
+
+    def handle(self, msg_type, xid, buf):
+        switch = self.switch
+        if msg_type == OFPT_ECHO_REQUEST:
+            self.send(OFPT_ECHO_REPLY, xid, buf[OFP_HEADER.size:])
+        elif msg_type == OFPT_FEATURES_REQUEST:
+            self.send(OFPT_FEATURES_REPLY, xid, FEATURES_REPLY.pack(switch.dpid, 0, 254, 0, 0x4F, 0))
+            if switch.handshake_at is None:
+                switch.handshake_at = time.monotonic()
+        elif msg_type == OFPT_GET_CONFIG_REQUEST:
+            self.send(OFPT_GET_CONFIG_REPLY, xid, struct.pack('!HH', 0, 0xFFFF))
+        elif msg_type == OFPT_GET_ASYNC_REQUEST:
+            self.send(OFPT_GET_ASYNC_REPLY, xid, b'\x00' * 24)
+        elif msg_type == OFPT_ROLE_REQUEST:
+            role, generation_id = ROLE.unpack_from(buf, OFP_HEADER.size)
+            error = switch.set_role(self, role, generation_id)
+            if error:
+                self.send_error(xid, *error, buf)
+            else:
+                self.send(OFPT_ROLE_REPLY, xid, ROLE.pack(self.role, switch.generation_id or 0))
+        elif msg_type == OFPT_BARRIER_REQUEST:
+            self.send(OFPT_BARRIER_REPLY, xid, b'')
+            if self.pending_flowmods:
+                self.pending_flowmods = False
+                switch.emulator.barrier_answered(switch, self)
+        elif msg_type == OFPT_FLOW_MOD:
+            if self.role == OFPCR_ROLE_SLAVE:
+                self.send_error(xid, OFPET_BAD_REQUEST, OFPBRC_IS_SLAVE, buf)
+                return
+            error = switch.flow_mod(self, buf)
+            self.pending_flowmods = True
+            if error:
+                self.send_error(xid, *error, buf)
+        elif msg_type == OFPT_MULTIPART_REQUEST:
+            mp_type, _ = MULTIPART.unpack_from(buf, OFP_HEADER.size)
+            body = buf[OFP_HEADER.size + MULTIPART.size:]
+            if mp_type == OFPMP_PORT_DESC:
+                self.send_multipart(xid, mp_type, switch.port_desc())
+            elif mp_type == OFPMP_FLOW:
+                self.send_multipart(xid, mp_type, switch.flow_stats(body))
+            elif mp_type == OFPMP_DESC:
+                self.send_multipart(xid, mp_type, [DESC.pack(b'of_switch_emulator', b'emulated', b'',
+                                                             str(switch.dpid).encode(), b'')])
+            else:
+                self.send_multipart(xid, mp_type, [])
+        elif msg_type == OFPT_EXPERIMENTER:
+            # ONF bundles are not emulated; the controller falls back to plain FlowMods
+            self.send_error(xid, OFPET_BAD_REQUEST, OFPBRC_BAD_EXPERIMENTER, buf)
+
+
+class Emulator:
+    def __init__(self, args):
+        self.args = args
+        self.controllers = [c.strip() for c in args.controllers.split(',') if c.strip()]
+        self.table_size = args.table_size
+        self.reconnect_delay = args.reconnect_delay
+        self.switches = [EmulatedSwitch(self, args.dpid_base + i) for i in range(args.switches)]
+        self.stopping = False
+        self.flow_mods = 0
+        self.flow_mods_by_command = {}
+        self.flow_mods_by_controller = {}
+        self.record = open(args.record, 'w') if args.record else None
+        # Probe policy tracking: priority -> {dpid: first FlowMod / committing barrier}
+        self.probe_priority = args.probe_priority
+        self.probe_seen = {}
+        self.probe_committed = {}
+        self.probe_watch = None  # (command kind, started) while a probe is in flight
+
+    def record_flow_mod(self, switch, session, command, table_id, priority, cookie, now):
+        self.flow_mods += 1
+        name = OFPFC_NAMES.get(command, str(command))
+        self.flow_mods_by_command[name] = self.flow_mods_by_command.get(name, 0) + 1
+        self.flow_mods_by_controller[session.controller] = self.flow_mods_by_controller.get(session.controller, 0) + 1
+        if self.record is not None:
+            self.record.write(json.dumps({'ts': time.time(), 'dpid': switch.dpid, 'controller': session.controller,
+                                          'command': name, 'table_id': table_id, 'priority': priority,
+                                          'cookie': cookie}) + "\n")
+        if self.probe_watch is not None and priority == self.probe_priority:
+            kind, _ = self.probe_watch
+            if (kind == 'add') == (command == OFPFC_ADD):
+                self.probe_seen.setdefault(switch.dpid, now)
+
+    def barrier_answered(self, switch, session):
+        """A barrier closed at least one FlowMod on this session."""
+        if switch.baseline_at is None:
+            switch.baseline_at = time.monotonic()  # the baseline NORMAL rule is in
+        if self.probe_watch is not None and switch.dpid in self.probe_seen:
+            self.probe_committed.setdefault(switch.dpid, time.monotonic())
+
+    async def connect_all(self):
+        tasks = []
+        rate = self.args.connect_rate
+        for i, switch in enumerate(self.switches):
+            if rate and i:
+                await asyncio.sleep(1.0 / rate)
+            switch.connect_started = time.monotonic()
+            for controller in self.controllers:
+                tasks.append(asyncio.ensure_future(Session(switch, controller).run()))
+        return tasks
+
+    async def wait_for(self, condition, timeout):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return condition()
+
+    def connect_report(self):
+        stages = {'handshake': [], 'master': [], 'baseline': []}
+        for switch in self.switches:
+            for stage in stages:
+                at = getattr(switch, f"{stage}_at")
+                if at is not None:
+                    stages[stage].append(at - switch.connect_started)
+        report = {stage: summarize(samples) for stage, samples in stages.items()}
+        report['switches'] = len(self.switches)
+        return report
+
+    def api_request(self, method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(self.args.api.rstrip('/') + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            body = resp.read()
+        return json.loads(body) if body else None
+
+    async def probe(self, kind, request):
+        """Time one API change until every switch has committed its FlowMods."""
+        loop = asyncio.get_running_loop()
+        self.probe_seen = {}
+        self.probe_committed = {}
+        started = time.monotonic()
+        self.probe_watch = (kind, started)
+        result = await loop.run_in_executor(None, request)
+        api_done = time.monotonic()
+        await self.wait_for(lambda: len(self.probe_committed) == len(self.switches), self.args.probe_timeout)
+        self.probe_watch = None
+        return result, {
+            'api_ms': round((api_done - started) * 1000, 3),
+            'first_flowmod': summarize([at - started for at in self.probe_seen.values()]),
+            'committed': summarize([at - started for at in self.probe_committed.values()]),
+            'switches_missing': len(self.switches) - len(self.probe_committed),
+        }
+
+    async def propagation(self):
+        policy = {
+            'name': 'of-switch-emulator-probe',
+            'priority': self.probe_priority,
+            'source': {'ip_block': '10.255.255.1'},
+            'destination': {'ip_block': '10.255.255.2'},
+            'service': [{'protocol': 'TCP', 'port': 9}],
+            'action': 'DENY',
+            'status': 'ENABLED',
+        }
+        created, add_report = await self.probe('add', lambda: self.api_request('POST', '/api/v1/policies', policy))
+        policy_id = created['id']
+        _, delete_report = await self.probe('delete', lambda: self.api_request('DELETE', f"/api/v1/policies/{policy_id}"))
+        return {'policy_add': add_report, 'policy_delete': delete_report}
+
+    def failover_report(self):
+        failovers = [f for switch in self.switches for f in switch.failovers]
+        return {
+            'takeovers': len(failovers),
+            'gap': summarize([f['gap'] for f in failovers]),
+            'flowmods_after_takeover': distribution([f['flowmods'] for f in failovers]),
+            'switches_without_master': sum(1 for switch in self.switches if switch.master is None),
+        }
+
+    async def run(self):
+        args = self.args
+        tasks = await self.connect_all()
+        connected = await self.wait_for(
+            lambda: all(s.baseline_at is not None for s in self.switches), args.connect_timeout)
+        if not connected:
+            log.warning("Not every switch finished connecting within --connect-timeout")
+        report = {
+            'controllers': self.controllers,
+            'connect_storm': self.connect_report(),
+        }
+
+        if args.api:
+            try:
+                report['propagation'] = await self.propagation()
+            except Exception as e:
+                log.error(f"Propagation probe failed: {e}")
+                report['propagation'] = {'error': str(e)}
+
+        if args.duration:
+            log.info(f"Holding sessions for {args.duration}s; stop the MASTER controller to measure failover.")
+            try:
+                await asyncio.sleep(args.duration)
+            except asyncio.CancelledError:
+                pass
+
+        report['failover'] = self.failover_report()
+        report['flow_mods'] = {
+            'total': self.flow_mods,
+            'by_command': self.flow_mods_by_command,
+            'by_controller': self.flow_mods_by_controller,
+        }
+        report['flow_table'] = distribution([len(s.flows) for s in self.switches])
+        self.stopping = True
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.record is not None:
+            self.record.close()
+        return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--controllers', default='127.0.0.1:6653',
+                        help="comma-separated host:port list; each switch connects to all of them")
+    parser.add_argument('--switches', type=int, default=100)
+    parser.add_argument('--dpid-base', type=lambda v: int(v, 0), default=1)
+    parser.add_argument('--connect-rate', type=float, default=0,
+                        help="switches connected per second (0 = all at once)")
+    parser.add_argument('--connect-timeout', type=float, default=60)
+    parser.add_argument('--reconnect-delay', type=float, default=1.0)
+    parser.add_argument('--table-size', type=int, default=0,
+                        help="flows per switch before OFPFMFC_TABLE_FULL (0 = unlimited)")
+    parser.add_argument('--api', help="policy API base URL for the propagation probe, e.g. http://127.0.0.1:8000")
+    parser.add_argument('--probe-priority', type=int, default=65000,
+                        help="priority of the probe policy; must not be used by other policies")
+    parser.add_argument('--probe-timeout', type=float, default=30)
+    parser.add_argument('--duration', type=float, default=0,
+                        help="seconds to keep sessions open after the probes (failover testing)")
+    parser.add_argument('--record', help="write every FlowMod as a JSON line to this file")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    parser.add_argument('--verbose', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    report = asyncio.run(Emulator(args).run())
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,373 @@
+"""
+Offline reconcile benchmark for the ZeroTrustController.
+
+Drives the controller's real reconcile logic against fake datapaths that
+record FlowMods instead of sending them. ZooKeeper, Kubernetes and
+PostgreSQL are stubbed out and the reconcile scheduler is run by hand, so
+the numbers are controller CPU cost only. Results are printed as JSON so
+runs can be compared across commits.
+
+Needs the controller's Python dependencies (ryu, kazoo, kubernetes,
+sqlalchemy, prometheus_client), e.g. inside the controller image:
+
+    docker compose run --rm -v ./validation:/validation ryu-controller \
+        python /validation/reconcile_bench.py --pods 1000 --policies 50
+
+Controller settings are read from the environment as usual, e.g.
+ZT_PIPELINE=multitable or ZT_FLOW_BUDGET=2000.
+"""
+import argparse
+import ipaddress
+import json
+import logging
+import os
+import random
+import resource
+import struct
+import sys
+import time
+import tracemalloc
+import types
+
+
+DEFAULT_CONTROLLER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ryu-controller')
+
+OFP_HEADER = struct.Struct('!BBHI')  # version, type, length, xid
+OFP_FLOW_MOD_COMMAND_OFFSET = 25     # header + cookie + cookie_mask + table_id
+
+
+class FakeDatapath:
+    """Stands in for a connected OVS switch.
+
+    Messages are serialized exactly as for a real switch; the raw stream is
+    parsed back into FlowMod add/delete counts and barrier xids instead of
+    being written to a socket.
+    """
+
+    def __init__(self, dpid, ofproto, ofproto_parser):
+        self.id = dpid
+        self.address = (f"192.0.2.{dpid}", 6653)
+        self.ofproto = ofproto
+        self.ofproto_parser = ofproto_parser
+        self.xid = 0
+        self.flow_adds = 0
+        self.flow_deletes = 0
+        self.bytes_sent = 0
+        self.other_msgs = []       # role/stats requests sent with send_msg
+        self.pending_barriers = []
+
+    def set_xid(self, msg):
+        self.xid = (self.xid + 1) & 0xFFFFFFFF
+        msg.set_xid(self.xid)
+        return self.xid
+
+    def send_msg(self, msg):
+        if msg.xid is None:
+            self.set_xid(msg)
+        msg.serialize()
+        self.send(msg.buf)
+        self.other_msgs.append(msg)
+
+    def send(self, buf):
+        ofp = self.ofproto
+        self.bytes_sent += len(buf)
+        offset = 0
+        while offset < len(buf):
+            _, msg_type, length, xid = OFP_HEADER.unpack_from(buf, offset)
+            if msg_type == ofp.OFPT_FLOW_MOD:
+                command = buf[offset + OFP_FLOW_MOD_COMMAND_OFFSET]
+                if command in (ofp.OFPFC_DELETE, ofp.OFPFC_DELETE_STRICT):
+                    self.flow_deletes += 1
+                else:
+                    self.flow_adds += 1
+            elif msg_type == ofp.OFPT_BARRIER_REQUEST:
+                self.pending_barriers.append(xid)
+            offset += length
+
+    def counters(self):
+        return self.flow_adds, self.flow_deletes, self.bytes_sent
+
+
+class _Disabled:
+    """Replaces the ZooKeeper HA manager and the K8s watcher; never started."""
+
+    member_id = 'reconcile-bench'
+    generation_id = 0
+
+    def __init__(self, ryu_app):
+        self.ryu_app = ryu_app
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def load_controller(controller_dir):
+    """Import zt_controller with its external services stubbed out."""
+    sys.path.insert(0, os.path.abspath(controller_dir))
+    import metrics
+    import policy_stats
+    import zt_controller
+
+    metrics.start_exporter = lambda: None
+    zt_controller.ZKLeaderElection = _Disabled
+    zt_controller.ZKShardMembership = _Disabled
+    zt_controller.K8sWatcher = _Disabled
+    zt_controller.create_engine = lambda *args, **kwargs: None
+    # Background loops (ZK, K8s, policy polling, stats polling, reconcile
+    # timers) are not started; the benchmark runs the reconcile scheduler itself.
+    zt_controller.hub = policy_stats.hub = types.SimpleNamespace(
+        spawn=lambda *args, **kwargs: None,
+        sleep=zt_controller.hub.sleep,
+        BoundedSemaphore=zt_controller.hub.BoundedSemaphore)
+    return zt_controller
+
+
+class Workload:
+    """Deterministic synthetic cluster: Pods, label sets and DENY policies."""
+
+    def __init__(self, args):
+        self.rng = random.Random(args.seed)
+        self.switches = args.switches
+        self.label_sets = [
+            {'app': f"app-{i}", 'tier': ('frontend', 'backend', 'data')[i % 3]}
+            for i in range(args.label_sets)
+        ]
+        self._ips = (str(ip) for ip in ipaddress.ip_network('10.0.0.0/8').hosts())
+        self.pods = {}  # { ip: (labels, node) }
+        for _ in range(args.pods):
+            self.new_pod()
+        self.policies = [self.policy_row(i) for i in range(args.policies)]
+
+    def new_pod(self):
+        ip = next(self._ips)
+        labels = dict(self.rng.choice(self.label_sets))
+        node = f"node-{self.rng.randrange(self.switches) + 1}"
+        self.pods[ip] = (labels, node)
+        return ip
+
+    def selector(self):
+        labels = self.rng.choice(self.label_sets)
+        if self.rng.random() < 0.2:
+            return {'label_selector': {'tier': labels['tier']}}
+        return {'label_selector': {'app': labels['app']}}
+
+    def services(self):
+        protocol = self.rng.choice(('TCP', 'TCP', 'UDP', 'ICMP', None))
+        if protocol is None:
+            return []
+        if protocol == 'ICMP':
+            return [{'protocol': 'ICMP'}]
+        ports = self.rng.sample(range(1024, 10000), self.rng.randint(1, 3))
+        return [{'protocol': protocol, 'port': port} for port in ports]
+
+    def policy_row(self, i, priority=None):
+        return types.SimpleNamespace(
+            id=f"bench-{i}",
+            name=f"bench-{i}",
+            priority=priority if priority is not None else self.rng.randint(1000, 9000),
+            source=self.selector(),
+            destination=self.selector(),
+            service=self.services(),
+            action='DENY',
+            status='ENABLED',
+        )
+
+    def pod_churn(self, count):
+        """Yield (event_type, ip, labels, node) for `count` random Pod changes."""
+        for _ in range(count):
+            roll = self.rng.random()
+            if roll < 0.3 or not self.pods:
+                ip = self.new_pod()
+                yield ('ADDED', ip) + self.pods[ip]
+            elif roll < 0.6:
+                ip = self.rng.choice(list(self.pods))
+                labels, node = self.pods.pop(ip)
+                yield 'DELETED', ip, labels, node
+            else:
+                ip = self.rng.choice(list(self.pods))
+                labels, node = self.pods[ip]
+                labels = dict(self.rng.choice(self.label_sets))
+                self.pods[ip] = (labels, node)
+                yield 'MODIFIED', ip, labels, node
+
+
+def summarize(samples):
+    """Latency percentiles (nearest rank) in milliseconds."""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))] * 1000, 3)
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p50_ms': pct(50),
+        'p95_ms': pct(95),
+        'p99_ms': pct(99),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+class Bench:
+    def __init__(self, zt, args):
+        self.zt = zt
+        self.args = args
+        self.workload = Workload(args)
+        self.app = zt.ZeroTrustController()
+        self.app.is_master = True
+        self.app.pods_synced = True  # The workload's Pods are the whole cache
+        from ryu.ofproto import ofproto_v1_3_parser
+        self.datapaths = [FakeDatapath(dpid, zt.ofproto_v1_3, ofproto_v1_3_parser)
+                          for dpid in range(1, args.switches + 1)]
+        self.phases = {}
+
+    def counters(self):
+        adds = deletes = sent = 0
+        for dp in self.datapaths:
+            dp_adds, dp_deletes, dp_sent = dp.counters()
+            adds += dp_adds
+            deletes += dp_deletes
+            sent += dp_sent
+        return adds, deletes, sent
+
+    def answer_barriers(self):
+        """Reply to every outstanding barrier so batches complete as on a real switch."""
+        for dp in self.datapaths:
+            barriers, dp.pending_barriers = dp.pending_barriers, []
+            for xid in barriers:
+                msg = types.SimpleNamespace(datapath=dp, xid=xid)
+                self.app.barrier_reply_handler(types.SimpleNamespace(msg=msg))
+
+    def measure(self, name, step, rounds=1):
+        """Time `step` (called once per round) and record FlowMods it caused."""
+        before = self.counters()
+        samples = []
+        for i in range(rounds):
+            started = time.perf_counter()
+            step(i)
+            samples.append(time.perf_counter() - started)
+            self.answer_barriers()
+        after = self.counters()
+        result = summarize(samples)
+        result['flow_adds'] = after[0] - before[0]
+        result['flow_deletes'] = after[1] - before[1]
+        result['bytes_sent'] = after[2] - before[2]
+        self.phases[name] = result
+        return result
+
+    def pod_event(self, event_type, ip, labels, node):
+        self.app.k8s_pod_update_handler(self.zt.EventK8sPodUpdate(event_type, ip, labels, node))
+
+    def connect_switches(self, _):
+        """Switch handshake plus an empty flow read-back for every switch."""
+        for dp in self.datapaths:
+            msg = types.SimpleNamespace(datapath=dp)
+            self.app.switch_features_handler(types.SimpleNamespace(msg=msg))
+            xid = self.app.readbacks[dp.id][0]
+            reply = types.SimpleNamespace(datapath=dp, xid=xid, body=[], flags=0)
+            self.app.flow_stats_reply_handler(types.SimpleNamespace(msg=reply))
+
+    def initial_sync(self, _):
+        for ip, (labels, node) in self.workload.pods.items():
+            self.pod_event('ADDED', ip, labels, node)
+        policy_map = self.app.policy_compiler.compile_all(self.workload.policies)
+        self.app.policy_update_handler(self.zt.EventPolicyUpdate(policy_map=policy_map))
+        self.app.reconcile_scheduler.run()
+
+    def idle_reconcile(self, _):
+        self.app.reconcile_all_flows()
+
+    def pod_churn(self, _):
+        for change in self.workload.pod_churn(self.args.churn_events):
+            self.pod_event(*change)
+        self.app.reconcile_scheduler.run()
+
+    def policy_churn(self, i):
+        index = i % len(self.workload.policies)
+        row = self.workload.policy_row(index)
+        self.workload.policies[index] = row
+        changed = {row.id: self.app.policy_compiler.compile(row)}
+        self.app.policy_update_handler(self.zt.EventPolicyUpdate(changed=changed))
+        self.app.reconcile_scheduler.run()
+
+    def run(self):
+        args = self.args
+        self.measure('connect', self.connect_switches)
+        self.measure('initial_sync', self.initial_sync)
+        self.measure('idle_full_reconcile', self.idle_reconcile, args.idle_rounds)
+        self.measure('pod_churn', self.pod_churn, args.churn_rounds)
+        if self.workload.policies:
+            self.measure('policy_churn', self.policy_churn, args.policy_churn_rounds)
+
+        app = self.app
+        return {
+            'workload': {
+                'pods': args.pods,
+                'label_sets': args.label_sets,
+                'policies': args.policies,
+                'switches': args.switches,
+                'churn_rounds': args.churn_rounds,
+                'churn_events_per_round': args.churn_events,
+                'seed': args.seed,
+            },
+            'settings': {name: value for name, value in sorted(os.environ.items())
+                         if name.startswith(('ZT_', 'RECONCILE_'))},
+            'phases': self.phases,
+            'final_state': {
+                'pods': len(app.pod_label_map),
+                'desired_flows': len(app.desired_flows),
+                'installed_flows': {dpid: len(flows) for dpid, flows in sorted(app.installed_flows.items())},
+                'pending_enforcement': len(app.pending_enforcement),
+                'scheduler': app.reconcile_scheduler.stats(),
+            },
+        }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pods', type=int, default=200, help="Pods at start (N)")
+    parser.add_argument('--label-sets', type=int, default=20, help="distinct Pod label sets (M)")
+    parser.add_argument('--policies', type=int, default=20, help="DENY policies (P)")
+    parser.add_argument('--switches', type=int, default=4, help="datapaths, one per node (S)")
+    parser.add_argument('--churn-rounds', type=int, default=50, help="merged Pod-churn reconciles")
+    parser.add_argument('--churn-events', type=int, default=5, help="Pod events per churn round")
+    parser.add_argument('--policy-churn-rounds', type=int, default=10, help="single-policy updates")
+    parser.add_argument('--idle-rounds', type=int, default=5, help="full reconciles with nothing changed")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="report the tracemalloc peak (slows every phase down)")
+    parser.add_argument('--controller-dir', default=os.environ.get('ZT_CONTROLLER_DIR', DEFAULT_CONTROLLER_DIR))
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    parser.add_argument('--verbose', action='store_true', help="keep controller INFO logging")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    zt = load_controller(args.controller_dir)
+    # The controller logs every Pod event at INFO, which would dominate the timings
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    report = Bench(zt, args).run()
+    report['memory'] = {'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    if args.trace_memory:
+        report['memory']['tracemalloc_peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+        tracemalloc.stop()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
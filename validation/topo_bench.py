@@ -0,0 +1,270 @@
+"""
+Non-interactive Mininet benchmark for the Zero-Trust controller.
+
+Builds a topology with kube_topo.build_k8s_topology(), waits for the
+baseline data plane to converge, then measures and writes JSON:
+
+  - baseline: ping RTT and iperf throughput between Pods on the first and
+    last node, with no ZT policies installed
+  - overhead: the same after --load-policies unrelated DENY policies have
+    been installed, as a percentage of the baseline (target: <5%)
+  - enforcement: a DENY policy between the probe Pods is created through the
+    API; reported is the time from the API call until the last echo reply
+    got through (pinging every --probe-interval seconds), and likewise the
+    time from deleting it until traffic flows again
+  - failover (--failover-cmd): the command (e.g. "docker compose kill
+    ryu-controller") is run and a DENY policy is created right after it; the
+    time until the data plane enforces it covers detection, takeover and
+    propagation (target: sub-second). Pings between another Pod pair
+    measure data-plane loss during the failover.
+
+Needs root (Mininet) and the docker-compose stack for the API/controllers:
+
+    sudo python validation/topo_bench.py --nodes 4 --pods-per-node 4 \\
+        --layout leaf-spine --load-policies 200 \\
+        --failover-cmd "docker compose kill ryu-controller" --output topo_bench.json
+"""
+import argparse
+import json
+import re
+import subprocess
+import time
+import urllib.request
+
+from mininet.log import setLogLevel
+
+from kube_topo import (add_topology_args, build_k8s_topology, check_topology_args, host_name, pod_ip,
+                       topology_kwargs)
+
+
+PING_REPLY = re.compile(r'^\[(\d+\.\d+)\] \d+ bytes from', re.M)
+PING_RTT = re.compile(r'= ([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+) ms')
+RATE_UNITS = {'bits/sec': 1e-6, 'Kbits/sec': 1e-3, 'Mbits/sec': 1.0, 'Gbits/sec': 1e3}
+
+
+def api_request(api, method, path, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(api.rstrip('/') + path, data=data, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        body = resp.read()
+    return json.loads(body) if body else None
+
+
+def deny_policy(name, src_ip, dst_ip, priority):
+    return {
+        'name': name,
+        'priority': priority,
+        'source': {'ip_block': f"{src_ip}/32"},
+        'destination': {'ip_block': f"{dst_ip}/32"},
+        'action': 'DENY',
+        'status': 'ENABLED',
+    }
+
+
+def mbps(rate):
+    """Convert an iperf rate string ('9.41 Gbits/sec') to Mbit/s."""
+    value, unit = rate.split()
+    return float(value) * RATE_UNITS[unit]
+
+
+class Pinger:
+    """Timestamped background ping (ping -D) from one Mininet host to an IP."""
+
+    def __init__(self, host, dst_ip, interval):
+        self.proc = host.popen(['ping', '-D', '-n', '-i', str(interval), dst_ip])
+
+    def stop(self):
+        """Stop pinging; returns the wall-clock times of the echo replies."""
+        self.proc.terminate()
+        output, _ = self.proc.communicate()
+        if isinstance(output, bytes):
+            output = output.decode(errors='replace')
+        return [float(ts) for ts in PING_REPLY.findall(output)]
+
+
+class TopoBench:
+    def __init__(self, net, args):
+        self.net = net
+        self.args = args
+        last = args.nodes
+        # Probe pair: first Pod on the first and on the last node (longest path)
+        self.src = net.get(host_name(1, 1, args.pods_per_node))
+        self.dst = net.get(host_name(last, 1, args.pods_per_node))
+        self.src_ip, self.dst_ip = pod_ip(1, 1), pod_ip(last, 1)
+        # Bystander pair for data-plane loss during failover
+        self.bystanders = None
+        if args.pods_per_node > 1:
+            self.bystanders = (net.get(host_name(1, 2, args.pods_per_node)), pod_ip(last, 2))
+        self.policy_ids = []
+
+    def create(self, policy):
+        policy_id = api_request(self.args.api, 'POST', '/api/v1/policies', policy)['id']
+        self.policy_ids.append(policy_id)
+        return policy_id
+
+    def delete(self, policy_id):
+        api_request(self.args.api, 'DELETE', f"/api/v1/policies/{policy_id}")
+        self.policy_ids.remove(policy_id)
+
+    def cleanup(self):
+        for policy_id in list(self.policy_ids):
+            try:
+                self.delete(policy_id)
+            except Exception as e:
+                print(f"Failed to delete policy {policy_id}: {e}")
+
+    def wait_converged(self):
+        """Wait until the probe pair can reach each other (STP, baseline flows)."""
+        deadline = time.time() + self.args.converge_timeout
+        started = time.time()
+        while time.time() < deadline:
+            if ' 0% packet loss' in self.src.cmd(f"ping -c 1 -W 1 {self.dst_ip}"):
+                return time.time() - started
+            time.sleep(0.5)
+        raise RuntimeError(f"{self.src_ip} cannot reach {self.dst_ip} after {self.args.converge_timeout}s")
+
+    def data_plane(self):
+        """Ping RTT (ms) and iperf throughput (Mbit/s) for the probe pair."""
+        output = self.src.cmd(f"ping -c {self.args.ping_count} -i 0.2 {self.dst_ip}")
+        match = PING_RTT.search(output)
+        rtt = dict(zip(('min', 'avg', 'max', 'mdev'), map(float, match.groups()))) if match else None
+        server, client = self.net.iperf((self.src, self.dst), seconds=self.args.iperf_seconds)
+        return {'ping_rtt_ms': rtt, 'iperf_mbps': {'server': mbps(server), 'client': mbps(client)}}
+
+    def time_change(self, change, blocked):
+        """Run change() while pinging the probe pair.
+
+        blocked=True: the pair must have been reachable right before the
+        change, within max(0.5s, 3 probe intervals) (RuntimeError
+        otherwise); seconds from the change until the last
+        reply got through (None if replies never stopped, or none arrived
+        after the change so the time is unknown). blocked=False: seconds
+        until the first reply after the change (None if none arrived).
+        """
+        pinger = Pinger(self.src, self.dst_ip, self.args.probe_interval)
+        time.sleep(1.0)
+        started = time.time()
+        change()
+        time.sleep(self.args.enforce_window)
+        replies = pinger.stop()
+        reachable_since = started - max(0.5, 3 * self.args.probe_interval)
+        if blocked and not any(reachable_since <= ts < started for ts in replies):
+            raise RuntimeError(f"{self.src_ip} could not reach {self.dst_ip} just before the change")
+        after = [ts for ts in replies if ts >= started]
+        if not after:
+            return None
+        if blocked:
+            if after[-1] > started + self.args.enforce_window - 2 * self.args.probe_interval - 0.1:
+                return None
+            return round(after[-1] - started, 4)
+        return round(after[0] - started, 4)
+
+    def enforcement(self):
+        policy = deny_policy('topo-bench-enforce', self.src_ip, self.dst_ip, self.args.probe_priority)
+        box = {}
+        enforce = self.time_change(lambda: box.setdefault('id', self.create(policy)), blocked=True)
+        release = self.time_change(lambda: self.delete(box['id']), blocked=False)
+        return {'deny_enforced_s': enforce, 'deny_removed_s': release}
+
+    def load(self, count):
+        """Install `count` DENY policies that do not touch the probe Pods."""
+        for i in range(count):
+            self.create(deny_policy(f"topo-bench-load-{i}", f"10.200.{i // 250}.{i % 250 + 1}",
+                                    f"10.201.{i // 250}.{i % 250 + 1}", 1000 + i % 1000))
+        time.sleep(self.args.settle)
+
+    def failover(self):
+        bystander = None
+        if self.bystanders is not None:
+            bystander = Pinger(self.bystanders[0], self.bystanders[1], self.args.probe_interval)
+            time.sleep(1.0)
+        policy = deny_policy('topo-bench-failover', self.src_ip, self.dst_ip, self.args.probe_priority)
+
+        def kill_then_apply():
+            subprocess.run(self.args.failover_cmd, shell=True, check=True)
+            self.create(policy)
+
+        enforced = self.time_change(kill_then_apply, blocked=True)
+        report = {'command': self.args.failover_cmd, 'deny_enforced_s': enforced}
+        if bystander is not None:
+            replies = bystander.stop()
+            gaps = [b - a for a, b in zip(replies, replies[1:])]
+            report['bystander_max_gap_s'] = round(max(gaps), 4) if gaps else None
+            report['bystander_replies'] = len(replies)
+        if self.args.restore_cmd:
+            subprocess.run(self.args.restore_cmd, shell=True, check=True)
+        return report
+
+    def run(self):
+        args = self.args
+        results = {'topology': {'nodes': args.nodes, 'pods_per_node': args.pods_per_node,
+                                'layout': args.layout, 'spines': args.spines,
+                                'probe': [self.src_ip, self.dst_ip]}}
+        try:
+            results['converged_s'] = round(self.wait_converged(), 3)
+            results['baseline'] = self.data_plane()
+            results['enforcement'] = self.enforcement()
+            if args.load_policies:
+                self.load(args.load_policies)
+                loaded = self.data_plane()
+                base = results['baseline']
+                loaded['policies'] = args.load_policies
+                loaded['throughput_overhead_pct'] = round(
+                    (1 - loaded['iperf_mbps']['client'] / base['iperf_mbps']['client']) * 100, 2)
+                if base['ping_rtt_ms'] and loaded['ping_rtt_ms']:
+                    loaded['rtt_overhead_pct'] = round(
+                        (loaded['ping_rtt_ms']['avg'] / base['ping_rtt_ms']['avg'] - 1) * 100, 2)
+                results['with_policies'] = loaded
+                results['enforcement_with_policies'] = self.enforcement()
+            if args.failover_cmd:
+                results['failover'] = self.failover()
+        finally:
+            self.cleanup()
+        return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_topology_args(parser)
+    parser.add_argument('--api', default='http://127.0.0.1:8000', help="policy API base URL")
+    parser.add_argument('--probe-priority', type=int, default=60000)
+    parser.add_argument('--probe-interval', type=float, default=0.01, help="seconds between probe pings")
+    parser.add_argument('--enforce-window', type=float, default=5.0,
+                        help="seconds to watch the probe pair after each change")
+    parser.add_argument('--converge-timeout', type=float, default=90.0)
+    parser.add_argument('--ping-count', type=int, default=20)
+    parser.add_argument('--iperf-seconds', type=int, default=10)
+    parser.add_argument('--load-policies', type=int, default=0,
+                        help="unrelated DENY policies to install for the overhead run")
+    parser.add_argument('--settle', type=float, default=5.0,
+                        help="seconds to wait after installing the load policies")
+    parser.add_argument('--failover-cmd', help="shell command that kills the MASTER controller")
+    parser.add_argument('--restore-cmd', help="shell command run after the failover test")
+    parser.add_argument('--output', help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+    check_topology_args(parser, args)
+    if args.nodes < 2:
+        parser.error("--nodes must be at least 2: the probe Pods sit on the first and last node")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setLogLevel('warning')
+    net = build_k8s_topology(**topology_kwargs(args))
+    try:
+        results = TopoBench(net, args).run()
+    finally:
+        net.stop()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()